@@ -0,0 +1,189 @@
+"""Async counterpart of db.py for pages that need several independent queries.
+
+Views stay synchronous: coroutines run on one background event loop per
+process, with its own psycopg AsyncConnectionPool, and the calling thread
+blocks until they finish. Use gather() to run helpers concurrently on separate
+connections, pipeline() to send several statements on one connection without
+waiting for each result, or start() to let a query run while the view does
+other work, so a page waits roughly as long as its slowest query instead of
+the sum of all of them:
+
+    jobs = adb.start(adb.get_jobs_by_employer(user_id))
+    user = utils.get_current_user()
+    render_template(..., jobs=jobs.result(adb.ADB_TIMEOUT), user=user)
+
+The async pool is sized like db.py's (DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE), so
+a worker can hold up to twice DB_POOL_MAX_SIZE connections. It always talks
+to the primary: replica routing (db.get_db_connection) does not apply here.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, List, Optional, Sequence, Tuple
+from psycopg import AsyncCursor
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+import cache
+import db
+import metrics
+from rows import EmployerJob, Job, typed_row
+
+# Upper bound on how long a view waits for its queries
+ADB_TIMEOUT = float(os.getenv("ADB_TIMEOUT", 30))
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_pool: Optional[AsyncConnectionPool] = None
+_pid: Optional[int] = None
+
+
+class InstrumentedAsyncCursor(AsyncCursor):
+    """Async twin of db.InstrumentedCursor"""
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            metrics.record_query(query, params, time.perf_counter() - started)
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _pool, _pid
+    with _lock:
+        # A forked worker inherits the object but not the thread running it
+        if _loop is None or _pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _pool = None
+            _pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="adb-loop", daemon=True).start()
+        return _loop
+
+
+async def _get_pool() -> AsyncConnectionPool:
+    global _pool
+    if _pool is None:
+        if not db.conn_str:
+            raise ValueError("POSTGRES_URL environment variable is not set")
+        pool = AsyncConnectionPool(
+            db.conn_str,
+            min_size=db.POOL_MIN_SIZE,
+            max_size=db.POOL_MAX_SIZE,
+            timeout=db.POOL_TIMEOUT,
+            max_lifetime=db.POOL_MAX_LIFETIME,
+            max_idle=db.POOL_MAX_IDLE,
+            check=AsyncConnectionPool.check_connection,
+            kwargs={"row_factory": dict_row, "cursor_factory": InstrumentedAsyncCursor},
+            name="joblynk-async",
+            open=False,
+        )
+        # Only the loop thread gets here, but opening awaits, so re-check after
+        await pool.open()
+        if _pool is None:
+            _pool = pool
+        else:
+            await pool.close()
+    return _pool
+
+
+async def _in_caller_context(coro, stats):
+    # Context variables do not cross threads; carry the caller's request stats over
+    if stats is not None:
+        metrics.start_request_stats(stats)
+    return await coro
+
+
+def start(coro) -> concurrent.futures.Future:
+    """Start a coroutine on the background loop; the caller collects it with .result(ADB_TIMEOUT)"""
+    task = _in_caller_context(coro, metrics.current_request_stats())
+    return asyncio.run_coroutine_threadsafe(task, _get_loop())
+
+
+def run(coro) -> Any:
+    """Run a coroutine on the background loop and return its result"""
+    return start(coro).result(ADB_TIMEOUT)
+
+
+@asynccontextmanager
+async def _connection():
+    pool = await _get_pool()
+    started = time.perf_counter()
+    async with pool.connection() as conn:
+        metrics.record_acquire(time.perf_counter() - started, pool="async")
+        yield conn
+
+
+async def _gather(coros):
+    return await asyncio.gather(*coros)
+
+
+def gather(*coros) -> List[Any]:
+    """Run independent helper coroutines concurrently and return their results in order"""
+    return run(_gather(coros))
+
+
+async def _pipeline(queries: Sequence[Tuple[str, Sequence]]) -> List[List[dict]]:
+    async with _connection() as conn:
+        cursors = []
+        async with conn.pipeline():
+            for sql, params in queries:
+                cur = conn.cursor()
+                await cur.execute(sql, params)
+                cursors.append(cur)
+        return [await cur.fetchall() for cur in cursors]
+
+
+def pipeline(*queries: Tuple[str, Sequence]) -> List[List[dict]]:
+    """Send (sql, params) statements on one connection in pipeline mode; returns each result's rows"""
+    return run(_pipeline(queries))
+
+
+async def _execute(conn, sql: str, params: Sequence, row_type: Optional[type]):
+    if row_type is None:
+        return await conn.execute(sql, params)
+    cur = conn.cursor(row_factory=typed_row(row_type), binary=True)
+    await cur.execute(sql, params, prepare=db.PREPARE_STATEMENTS)
+    return cur
+
+
+async def fetchone(sql: str, params: Sequence = (), row_type: Optional[type] = None) -> Any:
+    """One row as a dict, or as a prepared, binary-fetched row_type (see rows.py)"""
+    async with _connection() as conn:
+        cur = await _execute(conn, sql, params, row_type)
+        return await cur.fetchone()
+
+
+async def fetchall(sql: str, params: Sequence = (), row_type: Optional[type] = None) -> List[Any]:
+    async with _connection() as conn:
+        cur = await _execute(conn, sql, params, row_type)
+        return await cur.fetchall()
+
+
+@cache.cached("jobs")
+async def get_job_by_id(job_id: int) -> Optional[Job]:
+    return await fetchone(db.JOB_BY_ID_SQL, (job_id,), Job)
+
+
+async def get_jobs_by_employer(employer_id: int) -> List[EmployerJob]:
+    return await fetchall(db.JOBS_BY_EMPLOYER_SQL, (employer_id,), EmployerJob)
+
+
+def get_pool_stats() -> dict:
+    """Async pool counters, like db.get_pool_stats()"""
+    if _pool is None or _pid != os.getpid():
+        return {}
+    return _pool.get_stats()
+
+
+metrics.register_gauges("joblynk_adb_pool", "psycopg_pool statistic of the async pool", get_pool_stats)
+
+
+async def close() -> None:
+    """Close the async pool (run it through run())"""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
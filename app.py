@@ -1,18 +1,135 @@
+"""JobLynk web application.
 
-import os
+create_app() only builds the Flask app: it opens no connections and starts
+no threads, so gunicorn can import it once in the master (preload_app) and
+fork workers from there. Each process then calls warm_up() (gunicorn.conf.py
+does so in post_fork). Until warm-up has run, /readyz reports the worker as
+not ready.
+
+This module is the entry point (gunicorn, `python app.py`), so it loads .env:
+db, cache and the other modules read their settings when they are imported,
+and importing them has no side effects of its own.
+"""
 from dotenv import load_dotenv
-from flask import Flask
-from routes import routes
-from db import create_tables
 
 load_dotenv()
 
-app = Flask(__name__, static_folder="static", static_url_path="/static")
-app.secret_key = os.getenv("SECRET_KEY", os.urandom(24)) 
+import logging
+import os
+import threading
+import time
+from flask import Flask, g, request
+from routes import routes
+from migrations import SchemaVersionMismatch, check_schema_version
+import db
+import storage
+import assets
+import metrics
+import health
+import contact_spool
+import recommend
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_COOKIE = "db_primary_until"
+
+_warm_lock = threading.Lock()
+_warmed_pid = None
+
+
+def create_app() -> Flask:
+    app = Flask(__name__, static_folder="static", static_url_path="/static")
+    app.secret_key = os.getenv("SECRET_KEY", os.urandom(24))
+    # Reject oversized uploads before the body is read; leaves room for the form fields
+    app.config["MAX_CONTENT_LENGTH"] = storage.MAX_RESUME_BYTES + 1024 * 1024
+
+    app.register_blueprint(routes)
+    metrics.init_app(app)
+    assets.init_app(app)
+    health.init_app(app, warm_up)
+
+    if db.REPLICA_URLS:
+        _route_reads_after_writes(app)
+
+    # Benchmarks (bench/load.py) read per-request query counts from this header. Headers
+    # go out before a streamed body, so queries run while streaming (the freelancer
+    # status page) are missing here; the joblynk_request_db_queries metric has them.
+    if os.getenv("QUERY_COUNT_HEADER") == "1":
+        @app.after_request
+        def add_query_count_header(response):
+            if "request_stats" in g:
+                response.headers["X-DB-Queries"] = str(g.request_stats.queries)
+            return response
+
+    return app
+
+
+def _route_reads_after_writes(app: Flask) -> None:
+    """Pin a browser's reads to the primary for db.READ_YOUR_WRITES_SECONDS after it wrote,
+    so e.g. the dashboard right after posting a job never comes from a lagging replica"""
+
+    @app.before_request
+    def route_reads():
+        try:
+            until = float(request.cookies.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        now = time.time()
+        # The upper bound stops an edited cookie from pinning a client forever
+        db.start_request(pin_primary=now < until <= now + db.READ_YOUR_WRITES_SECONDS)
+
+    @app.after_request
+    def remember_write(response):
+        if db.wrote_in_request():
+            until = time.time() + db.READ_YOUR_WRITES_SECONDS
+            response.set_cookie(
+                PRIMARY_COOKIE, f"{until:.3f}", max_age=int(db.READ_YOUR_WRITES_SECONDS) + 1, httponly=True, samesite="Lax",
+            )
+        return response
+
+
+def warm_up(timeout: float = db.POOL_TIMEOUT) -> bool:
+    """Ready this process to serve: open its pool, prepare the hot statements on each
+    pooled connection, prime the listing caches and start the background workers.
+    Runs once per process. A database that cannot be reached is logged rather than
+    raised, so it never stops a worker from booting; timeout bounds each wait for a
+    connection, including the schema check's. A schema at the wrong version raises SchemaVersionMismatch, so the
+    process refuses to serve (gunicorn stops booting workers). Returns whether the
+    database part succeeded"""
+    global _warmed_pid
+    with _warm_lock:
+        if _warmed_pid == os.getpid():
+            return True
+        started = time.perf_counter()
+        try:
+            check_schema_version(timeout)
+        except SchemaVersionMismatch:
+            logger.critical("refusing to serve: the schema does not match this code", exc_info=True)
+            raise
+        except Exception:
+            logger.exception("could not check the schema version; /readyz will retry warm-up")
+            schema_checked = False
+        else:
+            schema_checked = True
+        # Messages a previous process left in the spool are flushed from here
+        contact_spool.start()
+        if not schema_checked:
+            return False
+        try:
+            db.warm_up(timeout)
+            db.get_jobs_page()
+            db.get_job_facets()
+        except Exception:
+            logger.exception("warm-up failed; /readyz will retry it")
+            return False
+        recommend.ensure_index()
+        _warmed_pid = os.getpid()
+        logger.info("warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000)
+        return True
 
 
-app.register_blueprint(routes)
-create_tables()
+app = create_app()
 
 if __name__ == "__main__":
+    warm_up()
     app.run(debug=False, host="0.0.0.0", port=int(os.getenv("PORT", 5001)))
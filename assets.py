@@ -0,0 +1,196 @@
+"""Fingerprinted, precompressed static assets.
+
+    python assets.py build     # static/** -> static/dist/ + manifest.json
+    python assets.py clean     # remove static/dist, including earlier builds
+
+build copies every file under static/ (except dist/) to static/dist/ with a
+content hash in its name, e.g. css/index.min.css -> css/index.min.3f2a9c1b.css.
+It rewrites relative url(...) references inside CSS to the hashed names and
+writes .gz copies (and .br copies when the brotli package is installed) of
+text assets that compress. manifest.json maps each source path to its hashed
+path.
+
+Templates link assets with asset_url("css/index.min.css"). When the manifest
+lists the file, that resolves to /assets/<hashed path>, which is served with
+a one-year immutable Cache-Control header and the best precompressed variant
+the client accepts. Otherwise it falls back to the plain /static URL, so
+development works without a build. nginx can serve /assets/ straight from
+static/dist with gzip_static/brotli_static and the same headers.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # .br variants are optional
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+ASSETS_URL_PREFIX = "/assets"
+HASH_LENGTH = 8
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html", ".xml", ".map"}
+# Precompressed variants in order of preference: (Accept-Encoding token, file suffix)
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+_manifest: Optional[Dict[str, str]] = None
+
+
+def _source_files():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if os.path.abspath(root) == DIST_DIR:
+            dirs[:] = []
+            continue
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, "/"), path
+
+
+def _hashed_name(relative: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    base, extension = posixpath.splitext(relative)
+    return f"{base}.{digest}{extension}"
+
+
+def _rewrite_css_urls(relative: str, css: bytes, manifest: Dict[str, str]) -> bytes:
+    directory = posixpath.dirname(relative)
+
+    def replace(match):
+        target = match.group(2).strip()
+        if re.match(r"^(?:[a-z]+:|/|#)", target, re.IGNORECASE):
+            return match.group(0)
+        path, _, suffix = target.partition("?")
+        resolved = posixpath.normpath(posixpath.join(directory, path))
+        if resolved not in manifest:
+            return match.group(0)
+        # Hashing keeps files in their directory, so relative references stay relative
+        hashed = posixpath.relpath(manifest[resolved], directory or ".")
+        return f"url({match.group(1)}{hashed}{'?' + suffix if suffix else ''}{match.group(1)})"
+
+    return _CSS_URL.sub(replace, css.decode("utf-8")).encode("utf-8")
+
+
+def _write(path: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _write_compressed(path: str, content: bytes) -> int:
+    """Write the .gz/.br variants that are smaller than content; returns how many were written"""
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content, quality=11)
+    written = 0
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(content):
+            _write(path + suffix, compressed)
+            written += 1
+    return written
+
+
+def build() -> Dict[str, str]:
+    """Fingerprint and precompress every static file; returns the manifest"""
+    sources = list(_source_files())
+    # CSS goes last so its url() references can point at already-hashed files
+    sources.sort(key=lambda item: item[0].endswith(".css"))
+    manifest: Dict[str, str] = {}
+    compressed = 0
+    for relative, path in sources:
+        with open(path, "rb") as f:
+            content = f.read()
+        if relative.endswith(".css"):
+            content = _rewrite_css_urls(relative, content, manifest)
+        hashed = _hashed_name(relative, content)
+        manifest[relative] = hashed
+        target = os.path.join(DIST_DIR, *hashed.split("/"))
+        _write(target, content)
+        if posixpath.splitext(relative)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            compressed += _write_compressed(target, content)
+    _write(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    print(f"Built {len(manifest)} asset(s) ({compressed} precompressed variant(s)) into {DIST_DIR}")
+    return manifest
+
+
+def clean() -> None:
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+
+
+def load_manifest() -> Dict[str, str]:
+    """The build manifest, or {} when assets have not been built"""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH) as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(filename: str) -> str:
+    """URL of a static file: the fingerprinted copy when built, else the plain static URL"""
+    from flask import url_for
+
+    hashed = load_manifest().get(filename)
+    if hashed is None:
+        return url_for("static", filename=filename)
+    return url_for("serve_asset", filename=hashed)
+
+
+def serve_asset(filename: str):
+    """Serve a fingerprinted file, precompressed when the client accepts it"""
+    from flask import abort, request, send_from_directory
+
+    # Files from earlier builds stay servable for pages rendered before a deploy
+    if filename == "manifest.json" or filename.endswith((".gz", ".br")):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if accepted[encoding] and os.path.exists(os.path.join(DIST_DIR, *(filename + suffix).split("/"))):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype)
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_app(app) -> None:
+    """Add the asset_url() template global and the /assets/ route"""
+    app.add_template_global(asset_url)
+    app.add_url_rule(f"{ASSETS_URL_PREFIX}/<path:filename>", "serve_asset", serve_asset)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets")
+    parser.add_argument("command", choices=["build", "clean"])
+    args = parser.parse_args(argv)
+    if args.command == "clean":
+        clean()
+    else:
+        build()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""Benchmarks for JobLynk.
+
+    python -m bench.seed --employers 10000 --jobs 1000000 --applications 5000000
+    QUERY_COUNT_HEADER=1 gunicorn              # in another shell
+    python -m bench.load --duration 30 --concurrency 16 --out before.json
+    python -m bench.startup --merge before.json
+    python -m bench.report before.json after.json
+
+seed bulk-loads synthetic users, jobs and applications into POSTGRES_URL with
+COPY and records the accounts it created. load drives the main endpoints with
+concurrent clients and writes a JSON report (p50/p95/p99 latency, throughput
+and queries per request). startup adds import, warm-up and gunicorn boot
+times to a report. report prints a report, or compares two of them.
+"""
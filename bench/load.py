@@ -0,0 +1,194 @@
+"""Concurrent load generator for the main JobLynk endpoints.
+
+Every client thread keeps one keep-alive HTTP connection, logs in as the seeded
+freelancer and employer, then loops over the selected scenarios until the
+duration is up. Start the server with QUERY_COUNT_HEADER=1 to also record
+queries per request (from the X-DB-Queries response header).
+
+The apply scenario submits real applications (a small, unique PDF each time)
+to random seeded jobs, so it adds rows and resume files to the database it
+runs against; apply_form only loads the form.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+from bench.report import summarize
+
+SCENARIOS = ["dashboard", "dashboard_search", "job_applications", "status", "login", "apply_form", "apply"]
+
+
+class Client:
+    def __init__(self, base_url: str, fixture: dict, rng: random.Random):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=30)
+        self.fixture = fixture
+        self.rng = rng
+        self.tokens = {}
+
+    def request(self, method: str, path: str, token=None, form=None, files=None):
+        """files maps field names to (filename, bytes) and sends form and files as multipart"""
+        headers = {}
+        body = None
+        if token:
+            headers["Cookie"] = f"auth_token={token}"
+        if files is not None:
+            boundary = uuid.uuid4().hex
+            parts = [
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+                for name, value in (form or {}).items()
+            ]
+            for name, (filename, content) in files.items():
+                parts.append(
+                    f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                    f"Content-Type: application/octet-stream\r\n\r\n".encode() + content + b"\r\n"
+                )
+            body = b"".join(parts) + f"--{boundary}--\r\n".encode()
+            headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+        elif form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            raise
+        return response
+
+    def login(self, role: str):
+        response = self.request("POST", "/login", form={"email": self.fixture[f"{role}_email"], "password": self.fixture["password"]})
+        for header, value in response.getheaders():
+            if header.lower() == "set-cookie" and value.startswith("auth_token="):
+                self.tokens[role] = value.split(";", 1)[0].split("=", 1)[1]
+                return response
+        raise RuntimeError(f"login as {role} failed with HTTP {response.status}")
+
+    def run_scenario(self, name: str):
+        """Issue one request for the scenario; returns (ok, response)"""
+        fixture, rng = self.fixture, self.rng
+        if name == "login":
+            response = self.login(rng.choice(["freelancer", "employer"]))
+            return response.status == 302, response
+        if name == "dashboard":
+            path = f"/freelancers/dashboard?page={rng.randint(1, 5)}"
+            role = "freelancer"
+        elif name == "dashboard_search":
+            path = "/freelancers/dashboard?" + urlencode({"search": rng.choice(fixture["search_terms"])})
+            role = "freelancer"
+        elif name == "job_applications":
+            path = f"/employer/job/applications/{rng.choice(fixture['employer_job_ids'])}"
+            role = "employer"
+        elif name == "status":
+            path = "/freelancers/status"
+            role = "freelancer"
+        elif name == "apply_form":
+            path = f"/job/apply/{rng.choice(fixture['job_ids'])}"
+            role = "freelancer"
+        elif name == "apply":
+            # A new application redirects to the dashboard; a job applied to before re-renders the form
+            resume = b"%PDF-1.4\n% bench " + uuid.uuid4().hex.encode() + b"\n%%EOF\n"
+            response = self.request(
+                "POST", f"/job/apply/{rng.choice(fixture['job_ids'])}", token=self.tokens["freelancer"],
+                form={"about": "Load test application."}, files={"resume": ("resume.pdf", resume)},
+            )
+            return response.status in (200, 302), response
+        else:
+            raise ValueError(f"unknown scenario {name}")
+        response = self.request("GET", path, token=self.tokens[role])
+        return response.status == 200, response
+
+
+def _worker(base_url, fixture, scenarios, deadline, seed, samples, lock):
+    rng = random.Random(seed)
+    client = Client(base_url, fixture, rng)
+    client.login("freelancer")
+    client.login("employer")
+    local = []
+    while time.perf_counter() < deadline:
+        name = rng.choice(scenarios)
+        started = time.perf_counter()
+        try:
+            ok, response = client.run_scenario(name)
+            queries = response.getheader("X-DB-Queries")
+        except (OSError, http.client.HTTPException, RuntimeError):
+            ok, queries = False, None
+        local.append((name, time.perf_counter() - started, ok, int(queries) if queries else None))
+    with lock:
+        samples.extend(local)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_load(base_url: str, fixture: dict, scenarios, concurrency: int, duration: float, seed: int = 1) -> dict:
+    """Drive the server for duration seconds and return the report"""
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_worker, args=(base_url, fixture, scenarios, deadline, seed + i, samples, lock))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "meta": {
+            "base_url": base_url,
+            "concurrency": concurrency,
+            "duration_s": round(elapsed, 2),
+            "scenarios": list(scenarios),
+            "git_revision": _git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "data": fixture.get("counts"),
+        },
+        **summarize(samples, elapsed),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test a running JobLynk server")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5001")
+    parser.add_argument("--fixture", default=os.path.join(os.path.dirname(__file__), "seed.json"), help="written by bench.seed")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    with open(args.fixture) as f:
+        fixture = json.load(f)
+    report = run_load(args.base_url, fixture, scenarios, args.concurrency, args.duration, args.seed)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote {args.out}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Summaries and comparisons of benchmark reports.
+
+    python -m bench.report run.json              # print one report
+    python -m bench.report before.json after.json  # compare two runs
+
+Reports that bench.startup --merge added startup times to show those too.
+"""
+import json
+import math
+import sys
+from collections import defaultdict
+from typing import Optional
+
+
+def percentile(sorted_values, fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _summary(latencies, errors: int, queries, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def summarize(samples, elapsed: float) -> dict:
+    """Turn (scenario, seconds, ok, queries) samples into per-scenario and total summaries"""
+    by_scenario = defaultdict(lambda: ([], [0], []))
+    for name, seconds, ok, queries in samples:
+        latencies, errors, query_counts = by_scenario[name]
+        latencies.append(seconds)
+        if not ok:
+            errors[0] += 1
+        if queries is not None:
+            query_counts.append(queries)
+    scenarios = {
+        name: _summary(latencies, errors[0], query_counts, elapsed)
+        for name, (latencies, errors, query_counts) in sorted(by_scenario.items())
+    }
+    total = _summary(
+        [s[1] for s in samples],
+        sum(1 for s in samples if not s[2]),
+        [s[3] for s in samples if s[3] is not None],
+        elapsed,
+    )
+    return {"scenarios": scenarios, "total": total}
+
+
+def _row(name: str, summary: dict) -> str:
+    latency = summary["latency_ms"]
+    queries = summary["queries_per_request"]
+    return (
+        f"{name:<18}{summary['requests']:>9}{summary['errors']:>8}{summary['throughput_rps'] or 0:>10.1f}"
+        f"{latency['p50'] or 0:>10.1f}{latency['p95'] or 0:>10.1f}{latency['p99'] or 0:>10.1f}"
+        f"{'' if queries is None else queries:>9}"
+    )
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{'scenario':<18}{'requests':>9}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}"]
+    for name, summary in report["scenarios"].items():
+        lines.append(_row(name, summary))
+    lines.append(_row("TOTAL", report["total"]))
+    if report.get("startup"):
+        lines.append("")
+        lines.extend(f"startup {key:<28}{value!s:>12}" for key, value in report["startup"].items())
+    return "\n".join(lines)
+
+
+def _change(before, after) -> str:
+    if before in (None, 0) or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def format_comparison(before: dict, after: dict) -> str:
+    lines = [f"{'scenario':<18}{'metric':<14}{'before':>12}{'after':>12}{'change':>10}"]
+    names = list(before["scenarios"]) + [n for n in after["scenarios"] if n not in before["scenarios"]]
+    for name in names + ["TOTAL"]:
+        old = before["total"] if name == "TOTAL" else before["scenarios"].get(name)
+        new = after["total"] if name == "TOTAL" else after["scenarios"].get(name)
+        if not old or not new:
+            lines.append(f"{name:<18}(only in one report)")
+            continue
+        metrics = [
+            ("req/s", old["throughput_rps"], new["throughput_rps"]),
+            ("p50 ms", old["latency_ms"]["p50"], new["latency_ms"]["p50"]),
+            ("p95 ms", old["latency_ms"]["p95"], new["latency_ms"]["p95"]),
+            ("p99 ms", old["latency_ms"]["p99"], new["latency_ms"]["p99"]),
+            ("queries/req", old["queries_per_request"], new["queries_per_request"]),
+            ("errors", old["errors"], new["errors"]),
+        ]
+        for label, a, b in metrics:
+            lines.append(f"{name:<18}{label:<14}{str(a):>12}{str(b):>12}{_change(a, b):>10}")
+    old, new = before.get("startup") or {}, after.get("startup") or {}
+    for key in [k for k in old if k in new and k != "workers"]:
+        lines.append(f"{'startup':<18}{key:<30}{str(old[key]):>12}{str(new[key]):>12}{_change(old[key], new[key]):>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (1, 2):
+        print("usage: python -m bench.report REPORT.json [OTHER.json]", file=sys.stderr)
+        return 2
+    reports = []
+    for path in argv:
+        with open(path) as f:
+            reports.append(json.load(f))
+    print(format_report(reports[0]) if len(reports) == 1 else format_comparison(*reports))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Row construction microbenchmark: dict rows against the typed rows in rows.py.
+
+    python -m bench.rows --repeat 5
+
+Runs the statements behind db.get_all_jobs and db.get_applications_for_employer
+(for the employer with the most applications) directly, bypassing the query
+cache, in three ways:
+
+    dict          text format, dict_row (what the helpers used to do)
+    dict-binary   binary format, dict_row
+    typed         binary format, class_row into rows.Job/Application, prepared
+
+For each it prints rows/sec (best of --repeat runs, fetch included) and the
+bytes each fetched row keeps alive, measured with tracemalloc.
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+if __name__ == "__main__":
+    # Run as a script: load .env before db reads its settings at import
+    from dotenv import load_dotenv
+    load_dotenv()
+import db
+from rows import Application, Job
+
+QUERIES = {
+    "all_jobs": (Job, "SELECT id, title, description, salary, job_type, employer_id FROM jobs", None),
+    "employer_applications": (
+        Application,
+        """
+        SELECT a.id, a.job_id, a.freelancer_id, a.cover_letter, a.resume_path, a.status, u.name AS freelancer_name, u.email AS freelancer_email, j.title AS job_title
+        FROM applications a
+        JOIN users u ON a.freelancer_id = u.id
+        JOIN jobs j ON a.job_id = j.id
+        WHERE j.employer_id = %s
+        """,
+        "SELECT j.employer_id FROM applications a JOIN jobs j ON a.job_id = j.id GROUP BY 1 ORDER BY count(*) DESC LIMIT 1",
+    ),
+}
+VARIANTS = ("dict", "dict-binary", "typed")
+
+
+def _fetch(conn, variant: str, row_type: type, sql: str, params):
+    if variant == "typed":
+        cur = db.typed_cursor(conn, row_type)
+        cur.execute(sql, params, prepare=True)
+    else:
+        cur = conn.cursor(binary=variant == "dict-binary")
+        cur.execute(sql, params, prepare=False)
+    return cur.fetchall()
+
+
+def measure(conn, variant: str, row_type: type, sql: str, params, repeat: int) -> dict:
+    best, rows = None, []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = _fetch(conn, variant, row_type, sql, params)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    count = len(rows)
+    del rows
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = _fetch(conn, variant, row_type, sql, params)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {
+        "rows": count,
+        "rows_per_sec": round(count / best) if best else None,
+        "bytes_per_row": round(retained / count) if count else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare dict rows with typed rows")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--queries", default=",".join(QUERIES), help=f"comma-separated subset of {','.join(QUERIES)}")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+    results = {}
+    with db.get_db_connection() as conn:
+        for name in args.queries.split(","):
+            row_type, sql, params_sql = QUERIES[name]
+            params = None
+            if params_sql:
+                found = conn.execute(params_sql).fetchone()
+                if found is None:
+                    print(f"{name}: no data, skipped", file=sys.stderr)
+                    continue
+                params = tuple(found.values())
+            results[name] = {variant: measure(conn, variant, row_type, sql, params, args.repeat) for variant in VARIANTS}
+        conn.rollback()
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'query':<24}{'variant':<14}{'rows':>8}{'rows/sec':>12}{'bytes/row':>11}")
+    for name, variants in results.items():
+        for variant, result in variants.items():
+            print(f"{name:<24}{variant:<14}{result['rows']:>8}{result['rows_per_sec']:>12}{result['bytes_per_row']:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Bulk-load synthetic users, jobs and applications for benchmarking.
+
+Rows are streamed with COPY using explicit ids (the sequences are moved past
+them afterwards), so ten million rows load in minutes. The accounts and ids
+the load generator needs are written to a JSON file (default bench/seed.json).
+Run `python migrations.py` against the database first.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from psycopg import connect
+if __name__ == "__main__":
+    # Run as a script: load .env before db reads its settings at import
+    from dotenv import load_dotenv
+    load_dotenv()
+import db
+
+PASSWORD = "bench-password"
+
+TITLE_WORDS = [
+    "Senior", "Junior", "Lead", "Remote", "Freelance", "Contract", "Python", "Django", "Flask",
+    "React", "Data", "DevOps", "Mobile", "iOS", "Android", "Backend", "Frontend", "Fullstack",
+    "Designer", "Developer", "Engineer", "Analyst", "Writer", "Editor", "Marketing", "SEO",
+]
+ROLES = ["Developer", "Engineer", "Designer", "Writer", "Analyst", "Consultant", "Specialist"]
+DESCRIPTION_WORDS = [
+    "build", "maintain", "scalable", "api", "database", "postgres", "design", "user", "interface",
+    "cloud", "aws", "kubernetes", "testing", "deliver", "features", "clients", "remote", "team",
+    "agile", "communication", "content", "strategy", "analytics", "dashboard", "mobile", "app",
+    "performance", "security", "integration", "payments", "machine", "learning", "research",
+]
+JOB_TYPES = ["Full-time", "Part-time", "Contract", "Internship"]
+STATUSES = ["applied"] * 6 + ["approved"] * 2 + ["rejected"] * 2
+SEARCH_TERMS = ["python", "senior developer", "design", "remote data", "kubernetes", "writer", "reac"]
+
+
+def _max_id(conn, table: str) -> int:
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+
+def _copy(conn, sql: str, rows, label: str, total: int) -> None:
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        with cur.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+    elapsed = time.perf_counter() - started
+    print(f"  {label}: {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def seed(employers: int, freelancers: int, jobs: int, applications: int, reset: bool = False, rng_seed: int = 42) -> dict:
+    """Load the synthetic data set and return the fixture the load generator uses"""
+    rng = random.Random(rng_seed)
+    if applications > freelancers * jobs:
+        raise ValueError("more applications requested than (freelancer, job) pairs exist")
+    with connect(db.conn_str) as conn:
+        if reset:
+            conn.execute("TRUNCATE applications, jobs, users, contacts RESTART IDENTITY CASCADE")
+        user_base = _max_id(conn, "users")
+        job_base = _max_id(conn, "jobs")
+        application_base = _max_id(conn, "applications")
+        run = f"{int(time.time())}"
+
+        def employer_id(i):
+            return user_base + 1 + i
+
+        def freelancer_id(i):
+            return user_base + 1 + employers + i
+
+        users = (
+            (employer_id(i), f"Employer {i}", f"bench-{run}-employer-{i}@example.test", PASSWORD, "employer", f"Company {i}", "1985-01-01")
+            for i in range(employers)
+        )
+        users = _chain(users, (
+            (freelancer_id(i), f"Freelancer {i}", f"bench-{run}-freelancer-{i}@example.test", PASSWORD, "freelancer", None, None)
+            for i in range(freelancers)
+        ))
+        print("Seeding")
+        _copy(conn, "COPY users (id, name, email, password, role, company_name, date_of_birth) FROM STDIN", users, "users", employers + freelancers)
+
+        job_rows = (
+            (
+                job_base + 1 + k,
+                f"{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {rng.choice(ROLES)}",
+                " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(15, 60))),
+                float(rng.randrange(300, 12000, 50)),
+                rng.choice(JOB_TYPES),
+                employer_id(k % employers),
+            )
+            for k in range(jobs)
+        )
+        _copy(conn, "COPY jobs (id, title, description, salary, job_type, employer_id) FROM STDIN", job_rows, "jobs", jobs)
+
+        # Application k goes from freelancer k % F to that freelancer's (k // F)-th job
+        # in a per-freelancer rotation, which keeps (job_id, freelancer_id) unique.
+        application_rows = (
+            (
+                application_base + 1 + k,
+                job_base + 1 + ((k % freelancers) * 7919 + k // freelancers) % jobs,
+                freelancer_id(k % freelancers),
+                "I would love to work on this. " + " ".join(rng.choices(DESCRIPTION_WORDS, k=20)),
+                None,
+                rng.choice(STATUSES),
+            )
+            for k in range(applications)
+        )
+        _copy(conn, "COPY applications (id, job_id, freelancer_id, cover_letter, resume_path, status) FROM STDIN", application_rows, "applications", applications)
+
+        for table in ("users", "jobs", "applications"):
+            conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+        conn.commit()
+        conn.autocommit = True
+        conn.execute("ANALYZE users, jobs, applications")
+
+    employer_jobs = [job_base + 1 + k for k in range(0, min(jobs, employers * 20), employers)]
+    return {
+        "password": PASSWORD,
+        "employer_email": f"bench-{run}-employer-0@example.test",
+        "freelancer_email": f"bench-{run}-freelancer-0@example.test",
+        "employer_job_ids": employer_jobs,
+        "job_ids": [job_base + 1 + rng.randrange(jobs) for _ in range(200)],
+        "search_terms": SEARCH_TERMS,
+        "counts": {"employers": employers, "freelancers": freelancers, "jobs": jobs, "applications": applications},
+    }
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed POSTGRES_URL with synthetic JobLynk data")
+    parser.add_argument("--employers", type=int, default=1000)
+    parser.add_argument("--freelancers", type=int, default=None, help="default: 5 per employer")
+    parser.add_argument("--jobs", type=int, default=50000)
+    parser.add_argument("--applications", type=int, default=200000)
+    parser.add_argument("--reset", action="store_true", help="truncate all tables first")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "seed.json"))
+    args = parser.parse_args(argv)
+    fixture = seed(args.employers, args.freelancers or args.employers * 5, args.jobs, args.applications, args.reset, args.seed)
+    with open(args.out, "w") as f:
+        json.dump(fixture, f, indent=2)
+    print(f"Wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Startup benchmark: how long until the app, and a gunicorn fleet, can serve.
+
+    python -m bench.startup --repeat 5 --workers 4 --merge run.json
+
+For each of --repeat fresh interpreters it measures import_ms (importing app,
+which builds it with create_app) and warm_up_ms (app.warm_up against
+POSTGRES_URL). It then starts gunicorn with gunicorn.conf.py, once with
+preload_app and once without. For each run it records first_ready_ms, the
+time until /readyz first answers 200, and all_ready_ms, the time until every
+worker has logged its warm-up. Medians are reported. --merge adds the numbers
+to a bench.load report as its "startup" section, which bench.report prints
+and compares.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+ok = app.warm_up()
+print(json.dumps({"import_ms": (imported - started) * 1000, "warm_up_ms": (time.perf_counter() - imported) * 1000, "ok": ok}))
+"""
+
+
+def measure_process(repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    if not all(sample["ok"] for sample in samples):
+        print("warning: warm-up failed in some runs, see POSTGRES_URL", file=sys.stderr)
+    return {
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "warm_up_ms": round(statistics.median(s["warm_up_ms"] for s in samples), 1),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_gunicorn(workers: int, preload: bool, timeout: float = 60) -> dict:
+    """Start gunicorn and time the first 200 from /readyz and the last worker warm-up"""
+    port = _free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", WEB_CONCURRENCY=str(workers))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}"],
+        cwd=ROOT, env=env, stderr=subprocess.PIPE, text=True,
+    )
+    warmed = []
+
+    def read_log():
+        for line in process.stderr:
+            if "warmed up" in line or "started cold" in line:
+                warmed.append(time.perf_counter())
+
+    threading.Thread(target=read_log, daemon=True).start()
+    first_ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if first_ready is None:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=5) as response:
+                        if response.status == 200:
+                            first_ready = time.perf_counter()
+                except (urllib.error.URLError, ConnectionError):
+                    pass
+            if first_ready is not None and len(warmed) >= workers:
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    ms = lambda at: round((at - started) * 1000, 1) if at is not None else None
+    return {"first_ready_ms": ms(first_ready), "all_ready_ms": ms(max(warmed)) if len(warmed) >= workers else None}
+
+
+def _median_runs(runs) -> dict:
+    return {
+        key: round(statistics.median(values), 1) if (values := [r[key] for r in runs if r[key] is not None]) else None
+        for key in runs[0]
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure JobLynk startup and warm-up time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--merge", help="add the results to this bench.load report")
+    args = parser.parse_args(argv)
+    startup = {"workers": args.workers, **measure_process(args.repeat)}
+    for preload in (True, False):
+        runs = [measure_gunicorn(args.workers, preload) for _ in range(args.repeat)]
+        for key, value in _median_runs(runs).items():
+            startup[f"{'preload' if preload else 'no_preload'}_{key}"] = value
+    if args.merge:
+        with open(args.merge) as f:
+            report = json.load(f)
+        report["startup"] = startup
+        with open(args.merge, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+        print(f"Added startup times to {args.merge}")
+    else:
+        print(json.dumps({"startup": startup}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
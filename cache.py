@@ -0,0 +1,296 @@
+"""Query result cache for read-mostly db.py helpers.
+
+Results live in a bounded in-process LRU with a TTL. When CACHE_REDIS_URL is set
+(and the redis package is installed) they are also stored in Redis so every
+gunicorn worker shares them. Entries are grouped in namespaces ("jobs", "users");
+invalidate(namespace) bumps the namespace's generation, which retires every
+cached entry in it, in this worker and, through Redis, in all the others.
+
+Workers re-read a namespace's generation from Redis at most every
+CACHE_GENERATION_TTL seconds, so another worker's invalidation reaches them
+within that interval. After CACHE_REDIS_MAX_FAILURES Redis errors in a row
+the shared tier is skipped for CACHE_REDIS_RETRY seconds, so an outage costs
+a few timeouts rather than one per cached call. Local-only namespaces never
+touch Redis; invalidating them only affects this worker.
+
+observe_version() ties a namespace to the data version (db.get_data_versions)
+a conditional GET was validated against: once a worker has seen version N,
+entries it cached before N are not served again. An ETag that names N then
+never goes out with a page cached before N, even when the writer's
+invalidation has not reached this worker (no Redis) or has not been sent yet.
+
+Cached values are shared between callers and must be treated as read-only.
+"""
+import asyncio
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+import metrics
+
+try:
+    import redis
+except ImportError:  # the shared tier is optional
+    redis = None
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 2048))
+CACHE_TTL = float(os.getenv("CACHE_TTL", 60))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "joblynk")
+CACHE_GENERATION_TTL = float(os.getenv("CACHE_GENERATION_TTL", 1))
+CACHE_REDIS_MAX_FAILURES = int(os.getenv("CACHE_REDIS_MAX_FAILURES", 3))
+CACHE_REDIS_RETRY = float(os.getenv("CACHE_REDIS_RETRY", 30))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+_generations = {}
+_shared_generations: "dict[str, Tuple[float, int]]" = {}  # namespace -> (expires_at, generation read from Redis)
+_stats = {
+    "hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "shared_hits": 0, "shared_errors": 0,
+    "shared_trips": 0, "invalidations": 0,
+}
+_local_only = set()  # namespaces kept out of the shared tier
+_namespaces = set()  # every namespace a @cached function uses
+_versions = {}  # namespace -> highest data version seen (see observe_version)
+_shared = None
+_shared_configured = False
+_shared_failures = 0
+_shared_retry_at = 0.0
+
+
+def configure_shared(client) -> None:
+    """Use client (a redis.Redis or compatible object, or None) as the shared tier"""
+    global _shared, _shared_configured, _shared_failures, _shared_retry_at
+    with _lock:
+        _shared = client
+        _shared_configured = True
+        _shared_failures = 0
+        _shared_retry_at = 0.0
+        _shared_generations.clear()
+
+
+def _shared_client(namespace: str):
+    """The Redis client to use for namespace, or None (no shared tier, local-only, or Redis failing)"""
+    global _shared, _shared_configured
+    if not _shared_configured:
+        _shared_configured = True
+        if CACHE_REDIS_URL and redis is not None:
+            _shared = redis.Redis.from_url(CACHE_REDIS_URL, socket_timeout=0.1, socket_connect_timeout=0.1)
+    if _shared is None or namespace in _local_only or time.monotonic() < _shared_retry_at:
+        return None
+    return _shared
+
+
+def _shared_succeeded() -> None:
+    global _shared_failures
+    _shared_failures = 0
+
+
+def _shared_failed() -> None:
+    """Count a Redis error; after CACHE_REDIS_MAX_FAILURES in a row, stop using Redis for a while"""
+    global _shared_failures, _shared_retry_at
+    with _lock:
+        _stats["shared_errors"] += 1
+        _shared_failures += 1
+        if _shared_failures >= CACHE_REDIS_MAX_FAILURES:
+            _shared_failures = 0
+            _shared_retry_at = time.monotonic() + CACHE_REDIS_RETRY
+            _shared_generations.clear()
+            _stats["shared_trips"] += 1
+
+
+def _count(stat: str) -> None:
+    with _lock:
+        _stats[stat] += 1
+
+
+def _invalidation_generation(namespace: str) -> int:
+    client = _shared_client(namespace)
+    if client is not None:
+        now = time.monotonic()
+        cached_generation = _shared_generations.get(namespace)
+        if cached_generation is not None and cached_generation[0] > now:
+            return cached_generation[1]
+        try:
+            generation = int(client.get(f"{CACHE_KEY_PREFIX}:gen:{namespace}") or 0)
+        except Exception:
+            _shared_failed()
+        else:
+            _shared_succeeded()
+            _shared_generations[namespace] = (now + CACHE_GENERATION_TTL, generation)
+            return generation
+    return _generations.get(namespace, 0)
+
+
+def _generation(namespace: str) -> str:
+    """Tag for entries cached now: the invalidation generation plus the data version seen"""
+    return f"{_invalidation_generation(namespace)}.{_versions.get(namespace, 0)}"
+
+
+def observe_version(namespace: str, version: int) -> None:
+    """Note that a page was validated against data version `version` of namespace;
+    from then on this worker only serves entries cached after it saw that version.
+    Ignored for names no @cached function uses"""
+    if namespace not in _namespaces:
+        return
+    with _lock:
+        # Versions only grow; a lagging replica may report an older one
+        if version > _versions.get(namespace, 0):
+            _versions[namespace] = version
+
+
+def lookup(namespace: str, key: str, generation: Optional[str] = None) -> Tuple[bool, Any]:
+    """Look key up in the local tier, then the shared one; returns (found, value)"""
+    if generation is None:
+        generation = _generation(namespace)
+    full_key = f"{namespace}:{key}"
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(full_key)
+        if entry is not None:
+            expires_at, entry_generation, value = entry
+            if entry_generation == generation and expires_at > now:
+                _entries.move_to_end(full_key)
+                _stats["hits"] += 1
+                return True, value
+            del _entries[full_key]
+            _stats["expirations"] += 1
+    client = _shared_client(namespace)
+    if client is not None:
+        try:
+            payload = client.get(f"{CACHE_KEY_PREFIX}:{namespace}:{generation}:{key}")
+        except Exception:
+            payload = None
+            _shared_failed()
+        else:
+            _shared_succeeded()
+        if payload is not None:
+            value = pickle.loads(payload)
+            _store_local(full_key, generation, value, CACHE_TTL)
+            _count("shared_hits")
+            return True, value
+    _count("misses")
+    return False, None
+
+
+def _store_local(full_key: str, generation: str, value: Any, ttl: float) -> None:
+    with _lock:
+        _entries[full_key] = (time.monotonic() + ttl, generation, value)
+        _entries.move_to_end(full_key)
+        while len(_entries) > CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def store(namespace: str, key: str, value: Any, ttl: Optional[float] = None, generation: Optional[str] = None) -> None:
+    """Store value in both tiers (the shared tier is skipped for local-only namespaces).
+
+    Pass the generation read before computing value, so a result computed
+    across an invalidation is filed under the old generation and never served.
+    """
+    ttl = CACHE_TTL if ttl is None else ttl
+    if generation is None:
+        generation = _generation(namespace)
+    _store_local(f"{namespace}:{key}", generation, value, ttl)
+    client = _shared_client(namespace)
+    if client is not None:
+        try:
+            client.set(f"{CACHE_KEY_PREFIX}:{namespace}:{generation}:{key}", pickle.dumps(value), ex=max(1, int(ttl)))
+        except Exception:
+            _shared_failed()
+        else:
+            _shared_succeeded()
+
+
+def invalidate(namespace: str) -> None:
+    """Retire every cached entry in namespace, in all workers when Redis is configured"""
+    _shared_generations.pop(namespace, None)
+    client = _shared_client(namespace)
+    if client is not None:
+        try:
+            generation = client.incr(f"{CACHE_KEY_PREFIX}:gen:{namespace}")
+        except Exception:
+            _shared_failed()
+        else:
+            _shared_succeeded()
+            # This worker sees its own write at once, the others within CACHE_GENERATION_TTL
+            _shared_generations[namespace] = (time.monotonic() + CACHE_GENERATION_TTL, int(generation))
+    with _lock:
+        _generations[namespace] = _generations.get(namespace, 0) + 1
+        for full_key in [k for k in _entries if k.startswith(namespace + ":")]:
+            del _entries[full_key]
+        _stats["invalidations"] += 1
+
+
+def clear() -> None:
+    """Drop the local tier (the shared tier expires on its own TTL)"""
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> dict:
+    """Hit/miss/eviction counters plus the current local tier size"""
+    with _lock:
+        return {**_stats, "size": len(_entries), "max_entries": CACHE_MAX_ENTRIES, "shared": _shared is not None}
+
+
+metrics.register_gauges("joblynk_cache", "Query cache statistic (see cache.stats)", stats)
+
+
+def cached(namespace: str, ttl: Optional[float] = None, local_only: bool = False) -> Callable:
+    """Cache a function's non-None results under namespace, keyed by its arguments.
+
+    local_only keeps results out of Redis (e.g. rows holding credentials).
+    The undecorated function stays available as fn.uncached.
+    """
+    _namespaces.add(namespace)
+    if local_only:
+        _local_only.add(namespace)
+
+    def decorator(fn):
+        def cache_key(args, kwargs):
+            return f"{fn.__name__}:{args!r}:{sorted(kwargs.items())!r}"
+
+        if inspect.iscoroutinefunction(fn):
+            async def off_loop(call, *call_args):
+                # Redis calls block, so they run in a thread instead of stalling the event loop
+                if _shared_client(namespace) is None:
+                    return call(*call_args)
+                return await asyncio.to_thread(call, *call_args)
+
+            # Same keys as the sync helper of the same name, so adb.py shares db.py's entries
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = cache_key(args, kwargs)
+                generation = await off_loop(_generation, namespace)
+                found, value = await off_loop(lookup, namespace, key, generation)
+                if found:
+                    return value
+                value = await fn(*args, **kwargs)
+                if value is not None:
+                    await off_loop(store, namespace, key, value, ttl, generation)
+                return value
+
+            async_wrapper.uncached = fn
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = cache_key(args, kwargs)
+            generation = _generation(namespace)
+            found, value = lookup(namespace, key, generation)
+            if found:
+                return value
+            value = fn(*args, **kwargs)
+            if value is not None:
+                store(namespace, key, value, ttl, generation)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
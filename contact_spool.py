@@ -0,0 +1,312 @@
+"""Write-behind spool for contact form submissions.
+
+submit() writes each message as a small JSON file to CONTACT_SPOOL_DIR/ready
+(written to tmp/, fsynced, then renamed, so a file is either complete or
+absent) and returns without touching Postgres. A background thread in each
+process flushes the spool every CONTACT_FLUSH_INTERVAL seconds, or sooner
+once CONTACT_FLUSH_BATCH messages are waiting. A flusher claims files by
+renaming them into claimed/<pid>/, so gunicorn workers sharing the directory
+never insert the same file twice. It inserts them with one executemany and
+deletes them after the commit.
+
+Every message carries a submission_id that is unique in contacts, so a
+message is never stored twice. That holds when a flusher dies between commit
+and delete: start() moves files claimed by dead processes back to ready/, and
+re-inserting them does nothing. When more than CONTACT_SPOOL_MAX messages are
+waiting, submit() raises SpoolFull so the endpoint can push back. If Postgres
+rejects a batch's data, the flusher retries its messages one at a time and
+moves any it still rejects to bad/*.bad, so one bad message cannot block the rest.
+
+    python contact_spool.py flush    # drain the spool now (e.g. before a deploy)
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+from psycopg import DataError
+if __name__ == "__main__":
+    # Run as a script: load .env before db reads its settings at import
+    from dotenv import load_dotenv
+    load_dotenv()
+import db
+import metrics
+
+CONTACT_SPOOL_DIR = os.getenv("CONTACT_SPOOL_DIR", os.path.join("spool", "contacts"))
+CONTACT_SPOOL_MAX = int(os.getenv("CONTACT_SPOOL_MAX", 10000))
+CONTACT_FLUSH_INTERVAL = float(os.getenv("CONTACT_FLUSH_INTERVAL", 2))
+CONTACT_FLUSH_BATCH = int(os.getenv("CONTACT_FLUSH_BATCH", 500))
+# Partially written files older than this were left by a crash
+STALE_TMP_SECONDS = 3600
+
+logger = logging.getLogger(__name__)
+
+
+class SpoolFull(Exception):
+    """Too many submissions are waiting to be written"""
+
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_pid: Optional[int] = None
+_waiting = 0  # this process's estimate of files in ready/, refreshed by each flush
+_stats = {
+    "submitted": 0, "rejected": 0, "flushed": 0, "flush_failures": 0, "recovered": 0, "bad": 0,
+    "last_flush_seconds": 0.0,
+}
+
+
+def _dir(name: str) -> str:
+    return os.path.join(CONTACT_SPOOL_DIR, name)
+
+
+def _claim_dir(pid: int) -> str:
+    return os.path.join(_dir("claimed"), str(pid))
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def submit(name: str, email: str, message: str) -> str:
+    """Durably queue a contact message and return its submission id.
+
+    Raises ValueError when a field holds text Postgres cannot store, SpoolFull when
+    the backlog is at CONTACT_SPOOL_MAX and OSError when the spool directory cannot
+    be written.
+    """
+    global _waiting
+    if any(db.UNSTORABLE_TEXT.search(value) for value in (name, email, message)):
+        raise ValueError("contact message contains NUL or invalid Unicode")
+    start()
+    if _waiting >= CONTACT_SPOOL_MAX:
+        with _lock:
+            _stats["rejected"] += 1
+        raise SpoolFull()
+    submission_id = str(uuid.uuid4())
+    record = {
+        "submission_id": submission_id,
+        "name": name,
+        "email": email,
+        "message": message,
+        "submitted_at": datetime.now(timezone.utc).isoformat(),
+    }
+    # The nanosecond prefix makes the flusher take messages roughly in arrival order
+    filename = f"{time.time_ns():020d}-{submission_id}.json"
+    tmp_path = os.path.join(_dir("tmp"), filename)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(_dir("ready"), filename))
+    _fsync_dir(_dir("ready"))
+    with _lock:
+        _waiting += 1
+        _stats["submitted"] += 1
+        if _waiting >= CONTACT_FLUSH_BATCH:
+            _wake.set()
+    return submission_id
+
+
+def _recover() -> int:
+    """Return files claimed by dead processes to ready/ and drop stale partial writes"""
+    recovered = 0
+    claimed_root = _dir("claimed")
+    for entry in os.scandir(claimed_root):
+        if not entry.is_dir() or not entry.name.isdigit():
+            continue
+        pid = int(entry.name)
+        if pid != os.getpid() and _alive(pid):
+            continue
+        for f in os.scandir(entry.path):
+            try:
+                os.replace(f.path, os.path.join(_dir("ready"), f.name))
+                recovered += 1
+            except FileNotFoundError:
+                pass
+        if pid != os.getpid():
+            try:
+                os.rmdir(entry.path)
+            except OSError:
+                pass
+    cutoff = time.time() - STALE_TMP_SECONDS
+    for f in os.scandir(_dir("tmp")):
+        if f.stat().st_mtime < cutoff:
+            try:
+                os.remove(f.path)
+            except FileNotFoundError:
+                pass
+    return recovered
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _claim(limit: int) -> List[str]:
+    """Move up to limit ready files into this process's claim directory"""
+    global _waiting
+    names = sorted(os.listdir(_dir("ready")))
+    with _lock:
+        _waiting = len(names)
+    claim_dir = _claim_dir(os.getpid())
+    claimed = []
+    for name in names:
+        if len(claimed) >= limit:
+            break
+        if not name.endswith(".json"):
+            continue
+        target = os.path.join(claim_dir, name)
+        try:
+            os.rename(os.path.join(_dir("ready"), name), target)
+        except FileNotFoundError:  # another worker took it
+            continue
+        claimed.append(target)
+    return claimed
+
+
+def flush_once(limit: int = CONTACT_FLUSH_BATCH) -> int:
+    """Insert one batch of spooled messages; returns how many files were flushed"""
+    global _waiting
+    paths = _claim(limit)
+    if not paths:
+        return 0
+    rows, done = [], []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                rows.append(json.load(f))
+            done.append(path)
+        except ValueError:
+            logger.error("setting aside unreadable contact spool file %s", path)
+            _set_aside(path)
+    started = time.perf_counter()
+    bad = 0
+    try:
+        try:
+            db.insert_contacts(rows)
+        except DataError:
+            logger.warning("contact batch of %d rejected, retrying one message at a time", len(rows))
+            bad = _insert_one_by_one(rows, done)
+    except Exception:
+        logger.exception("flushing %d contact message(s) failed", len(rows))
+        for path in done:
+            if os.path.exists(path):
+                os.replace(path, os.path.join(_dir("ready"), os.path.basename(path)))
+        with _lock:
+            _stats["flush_failures"] += 1
+        raise
+    for path in done:
+        if os.path.exists(path):
+            os.remove(path)
+    with _lock:
+        _waiting = max(0, _waiting - len(paths))
+        _stats["flushed"] += len(done) - bad
+        _stats["bad"] += bad
+        _stats["last_flush_seconds"] = time.perf_counter() - started
+    return len(paths)
+
+
+def _set_aside(path: str) -> None:
+    """Move a spool file that can never be stored to bad/ for someone to look at"""
+    os.replace(path, os.path.join(_dir("bad"), os.path.basename(path) + ".bad"))
+
+
+def _insert_one_by_one(rows: List[dict], paths: List[str]) -> int:
+    """Insert each message on its own and set aside the ones Postgres rejects; returns how many it set aside"""
+    bad = 0
+    for row, path in zip(rows, paths):
+        try:
+            db.insert_contacts([row])
+        except DataError:
+            logger.exception("setting aside contact spool file %s that the database rejects", path)
+            _set_aside(path)
+            bad += 1
+            continue
+        os.remove(path)
+    return bad
+
+
+def flush_all() -> int:
+    """Flush until the spool is empty; returns the number of messages written"""
+    total = 0
+    while True:
+        flushed = flush_once()
+        if not flushed:
+            return total
+        total += flushed
+
+
+def _run() -> None:
+    backoff = CONTACT_FLUSH_INTERVAL
+    while True:
+        _wake.wait(backoff)
+        _wake.clear()
+        try:
+            while flush_once() >= CONTACT_FLUSH_BATCH:
+                pass
+            backoff = CONTACT_FLUSH_INTERVAL
+        except Exception:
+            # Postgres is unavailable: keep spooling and retry less often
+            backoff = min(backoff * 2, 60)
+
+
+def start() -> None:
+    """Create the spool, recover leftovers and start this process's flusher (idempotent)"""
+    global _pid
+    if _pid == os.getpid():
+        return
+    with _lock:
+        # A forked worker inherits the flag but not the thread
+        if _pid == os.getpid():
+            return
+        for name in ("tmp", "ready", "claimed", "bad"):
+            os.makedirs(_dir(name), exist_ok=True)
+        os.makedirs(_claim_dir(os.getpid()), exist_ok=True)
+        recovered = _recover()
+        _stats["recovered"] += recovered
+        if recovered:
+            logger.info("recovered %d contact message(s) from the spool", recovered)
+        _pid = os.getpid()
+        threading.Thread(target=_run, name="contact-spool", daemon=True).start()
+        _wake.set()
+
+
+def stats() -> dict:
+    """Spool counters for this process, plus the current backlog estimate"""
+    with _lock:
+        return dict(_stats, waiting=_waiting, limit=CONTACT_SPOOL_MAX)
+
+
+metrics.register_gauges("joblynk_contact_spool", "Contact spool backlog and flush counters for this process", stats)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ["flush"]:
+        print("usage: python contact_spool.py flush", file=sys.stderr)
+        return 2
+    for name in ("tmp", "ready", "claimed", "bad"):
+        os.makedirs(_dir(name), exist_ok=True)
+    os.makedirs(_claim_dir(os.getpid()), exist_ok=True)
+    _recover()
+    print(f"Flushed {flush_all()} contact message(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,312 +1,1225 @@
+import itertools
+import logging
 import os
-from typing import Optional, List
-from psycopg import connect, Connection
-from psycopg.rows import dict_row
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Iterable, Iterator, Callable
+from psycopg import Connection, Cursor, OperationalError
+from psycopg.rows import dict_row, tuple_row
 from psycopg.errors import UniqueViolation
-from dotenv import load_dotenv
+from psycopg_pool import ConnectionPool, PoolTimeout
+import cache
+import metrics
+from rows import (
+    Application, EmployerJob, FreelancerApplication, FreelancerApplicationSummary, Job, JobListing, SearchResult, User,
+    typed_row,
+)
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 conn_str = os.getenv("POSTGRES_URL")
 
-def get_db_connection() -> Connection:
-    if not conn_str:
-        raise ValueError("POSTGRES_URL environment variable is not set")
-    return connect(conn_str, row_factory=dict_row)
+# Postgres text cannot hold NUL, and lone surrogates (e.g. a JSON "\ud800") are not valid UTF-8
+UNSTORABLE_TEXT = re.compile("[\x00\ud800-\udfff]")
 
-def create_tables(reset_all: bool = False) -> None:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    if reset_all:
-        cur.execute("DROP TABLE IF EXISTS applications CASCADE")
-        cur.execute("DROP TABLE IF EXISTS jobs CASCADE")
-        cur.execute("DROP TABLE IF EXISTS users CASCADE")
-        cur.execute("DROP TABLE IF EXISTS contacts CASCADE")
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL CHECK (role IN ('freelancer', 'employer')),
-            company_name TEXT,
-            date_of_birth DATE
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS jobs (
-            id SERIAL PRIMARY KEY,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            salary DOUBLE PRECISION NOT NULL,
-            job_type TEXT NOT NULL,
-            employer_id INTEGER NOT NULL REFERENCES users(id)
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS applications (
-            id SERIAL PRIMARY KEY,
-            job_id INTEGER NOT NULL REFERENCES jobs(id),
-            freelancer_id INTEGER NOT NULL REFERENCES users(id),
-            cover_letter TEXT,
-            resume_path TEXT,
-            status TEXT DEFAULT 'applied' CHECK (status IN ('applied', 'approved', 'rejected')),
-            UNIQUE(job_id, freelancer_id)
-        );
-        """
+# Pool sizing is per process: every gunicorn worker opens its own pool the
+# first time it touches the database, and adb.py opens an async pool of the
+# same size next to it, so keep 2 * max_size * workers below the server's
+# max_connections.
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 5))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 1800))
+POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", 300))
+# The hot, fixed statements are prepared on the server the first time each
+# connection runs them. Set to 0 behind a pooler that cannot keep prepared
+# statements (pgbouncer in transaction mode before 1.21).
+PREPARE_STATEMENTS = os.getenv("DB_PREPARE_STATEMENTS", "1") != "0"
+
+_pool: Optional[ConnectionPool] = None
+_pool_pid: Optional[int] = None
+
+# Read replicas. Helpers that can tolerate a little replication lag borrow
+# connections with get_db_connection(read_only=True); everything else, and
+# every read in a request pinned by pin_primary(), goes to POSTGRES_URL.
+REPLICA_URLS = [url.strip() for url in os.getenv("POSTGRES_REPLICA_URLS", "").split(",") if url.strip()]
+# How long a read waits for a replica connection before trying the next one
+REPLICA_TIMEOUT = float(os.getenv("DB_REPLICA_TIMEOUT", 1))
+# A replica that failed is skipped for this long
+REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))
+# Skip replicas more than this many seconds behind (unset: no lag check),
+# measuring each replica's lag at most every REPLICA_LAG_CHECK_SECONDS
+REPLICA_MAX_LAG = float(os.environ["DB_REPLICA_MAX_LAG"]) if os.getenv("DB_REPLICA_MAX_LAG") else None
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", 5))
+# After a user writes, their reads go to the primary for this long (see app.py)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 10))
+
+# Zero when the replica has replayed everything it received, so an idle
+# primary does not look like lag; 0 as well on a server that is not a standby
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END::float8 AS lag
+"""
+
+class _Replica:
+    __slots__ = ("name", "url", "pool", "pid", "down_until", "lag", "lag_checked_at")
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.pool: Optional[ConnectionPool] = None
+        self.pid: Optional[int] = None
+        self.down_until = 0.0
+        self.lag = 0.0
+        self.lag_checked_at = float("-inf")
+
+_replicas = [_Replica(f"replica{i}", url) for i, url in enumerate(REPLICA_URLS)]
+_replica_turn = itertools.count()
+_PRIMARY = "primary"
+# Where this request's reads go: None (not chosen yet), a _Replica or _PRIMARY.
+# Keeping one replica per request means the data a page reads is never older
+# than the data versions it read first
+_read_route: ContextVar = ContextVar("read_route", default=None)
+_wrote: ContextVar[bool] = ContextVar("wrote", default=False)
+READS_ROUTED = metrics.Counter(
+    "joblynk_db_read_checkouts_total", "Read-only connection checkouts by where they went", labels=("target",),
+)
+
+class InstrumentedCursor(Cursor):
+    """Cursor that times each statement it runs and reports it to metrics"""
+
+    def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            metrics.record_query(query, params, time.perf_counter() - started)
+
+    def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            metrics.record_query(query, None, time.perf_counter() - started)
+
+# Statements shared with the async helpers in adb.py
+USER_BY_ID_SQL = "SELECT id, name, email, password, role, company_name, date_of_birth FROM users WHERE id = %s"
+JOBS_BY_EMPLOYER_SQL = """
+    SELECT j.id, j.title, j.description, j.salary, j.job_type,
+           COALESCE(c.applied, 0) AS applied_count,
+           COALESCE(c.approved, 0) AS approved_count,
+           COALESCE(c.rejected, 0) AS rejected_count
+    FROM jobs j
+    LEFT JOIN job_application_counts c ON c.job_id = j.id
+    WHERE j.employer_id = %s
+"""
+JOB_BY_ID_SQL = "SELECT id, title, description, salary, job_type, employer_id FROM jobs WHERE id = %s"
+DATA_VERSIONS_SQL = "SELECT scope, version FROM data_versions WHERE scope = ANY(%s)"
+
+def typed_cursor(conn: Connection, row_type: type) -> Cursor:
+    """Cursor that builds row_type instances (see rows.py) from binary-format results"""
+    return conn.cursor(row_factory=typed_row(row_type), binary=True)
+
+def _open_pool(url: str, name: str) -> ConnectionPool:
+    return ConnectionPool(
+        url,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT,
+        max_lifetime=POOL_MAX_LIFETIME,
+        max_idle=POOL_MAX_IDLE,
+        check=ConnectionPool.check_connection,
+        kwargs={"row_factory": dict_row, "cursor_factory": InstrumentedCursor},
+        name=name,
+        open=True,
     )
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, opening it on first use"""
+    global _pool, _pool_pid
+    # A pool inherited through fork shares its sockets with the parent, so a
+    # forked worker leaves it alone (never closes it) and opens its own
+    if _pool is None or _pool_pid != os.getpid():
+        if not conn_str:
+            raise ValueError("POSTGRES_URL environment variable is not set")
+        _pool = _open_pool(conn_str, "joblynk")
+        _pool_pid = os.getpid()
+    return _pool
+
+def _replica_pool(replica: _Replica) -> ConnectionPool:
+    if replica.pool is None or replica.pid != os.getpid():
+        replica.pool = _open_pool(replica.url, f"joblynk-{replica.name}")
+        replica.pid = os.getpid()
+    return replica.pool
+
+def close_pool() -> None:
+    """Close the connection pools; the next query opens fresh ones"""
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+    _pool = None
+    for replica in _replicas:
+        if replica.pool is not None and replica.pid == os.getpid():
+            replica.pool.close()
+        replica.pool = None
+
+def warm_up(timeout: float = POOL_TIMEOUT) -> None:
+    """Open the pool and prepare the hot statements on each of its POOL_MIN_SIZE connections.
+    Raises psycopg_pool.PoolTimeout if the database cannot be reached within timeout"""
+    statements = [
+        (USER_BY_ID_SQL, User, (0,)),
+        (JOB_BY_ID_SQL, Job, (0,)),
+        (JOBS_BY_EMPLOYER_SQL, EmployerJob, (0,)),
+        (DATA_VERSIONS_SQL, None, ([],)),
+    ]
+    pool = get_pool()
+    pool.wait(timeout)
+    with ExitStack() as stack:
+        # Hold them all at once, otherwise the pool hands back the same connection
+        for _ in range(POOL_MIN_SIZE):
+            conn = stack.enter_context(pool.connection(timeout=timeout))
+            for sql, row_type, params in statements:
+                cur = typed_cursor(conn, row_type) if row_type else conn.cursor()
+                cur.execute(sql, params, prepare=PREPARE_STATEMENTS)
+                cur.fetchall()
+
+def get_pool_stats() -> dict:
+    """Pool counters (connections, waiting requests, wait time in ms, timeouts)"""
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return _pool.get_stats()
+
+metrics.register_gauges("joblynk_db_pool", "psycopg_pool statistic (see ConnectionPool.get_stats)", get_pool_stats)
+
+def get_replica_stats() -> dict:
+    """How many replicas are configured and down, and the largest lag last measured"""
+    now = time.monotonic()
+    if not _replicas:
+        return {}
+    return {
+        "configured": len(_replicas),
+        "down": sum(1 for replica in _replicas if replica.down_until > now),
+        "max_lag_seconds": max(replica.lag for replica in _replicas),
+    }
+
+metrics.register_gauges("joblynk_db_replicas", "Read replica health in this process", get_replica_stats)
+
+def start_request(pin_primary: bool = False) -> None:
+    """Reset read routing at the start of a request; pin_primary sends every read to the primary"""
+    _read_route.set(_PRIMARY if pin_primary else None)
+    _wrote.set(False)
+
+def pin_primary() -> None:
+    """Send the rest of this request's reads to the primary"""
+    _read_route.set(_PRIMARY)
+
+def wrote_in_request() -> bool:
+    """Whether this request committed a write the user may expect to read back"""
+    return _wrote.get()
+
+def _note_write() -> None:
+    _wrote.set(True)
+    pin_primary()
+
+def _lagging(replica: _Replica, conn: Connection) -> bool:
+    if REPLICA_MAX_LAG is None:
+        return False
+    now = time.monotonic()
+    if now - replica.lag_checked_at >= REPLICA_LAG_CHECK_SECONDS:
+        replica.lag = conn.execute(REPLICA_LAG_SQL).fetchone()["lag"]
+        replica.lag_checked_at = now
+        conn.rollback()
+    return replica.lag > REPLICA_MAX_LAG
+
+def _replica_candidates() -> List[_Replica]:
+    """Replicas to try, in order: this request's replica if it has one, else all healthy ones round-robin"""
+    route = _read_route.get()
+    if route is _PRIMARY or not _replicas:
+        return []
+    now = time.monotonic()
+    if route is not None:
+        # Moving to another replica could go back in time, so only the primary is left
+        return [route] if route.down_until <= now else []
+    start = next(_replica_turn)
+    ordered = [_replicas[(start + i) % len(_replicas)] for i in range(len(_replicas))]
+    return [replica for replica in ordered if replica.down_until <= now]
+
+def _checkout_replica() -> Optional[tuple]:
+    """(exit stack, connection) from the first usable replica, or None to use the primary"""
+    for replica in _replica_candidates():
+        attempt = ExitStack()
+        try:
+            conn = attempt.enter_context(_replica_pool(replica).connection(timeout=REPLICA_TIMEOUT))
+            lagging = _lagging(replica, conn)
+        except (PoolTimeout, OperationalError):
+            attempt.close()
+            replica.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+            logger.warning("replica %s unavailable, skipping it for %ds", replica.name, REPLICA_RETRY_SECONDS)
+            continue
+        if lagging:
+            attempt.close()
+            continue
+        _read_route.set(replica)
+        return attempt, conn
+    return None
+
+@contextmanager
+def get_db_connection(read_only: bool = False) -> Iterator[Connection]:
+    """Borrow a pooled connection; it is returned to the pool when the block exits.
+
+    With read_only=True and POSTGRES_REPLICA_URLS set, the connection comes from
+    a healthy replica within DB_REPLICA_MAX_LAG, falling back to the primary.
+    Raises psycopg_pool.PoolTimeout if no connection frees up within DB_POOL_TIMEOUT.
+    """
+    started = time.perf_counter()
+    if read_only and _replicas:
+        checkout = _checkout_replica()
+        if checkout is not None:
+            attempt, conn = checkout
+            READS_ROUTED.inc(target="replica")
+            metrics.record_acquire(time.perf_counter() - started, pool="replica")
+            with attempt:
+                yield conn
+            return
+        READS_ROUTED.inc(target="primary")
+        # Whatever this request reads next must be at least as new as this
+        pin_primary()
+    with get_pool().connection() as conn:
+        metrics.record_acquire(time.perf_counter() - started)
+        yield conn
+
+def create_tables(reset_all: bool = False) -> None:
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        if reset_all:
+            cur.execute("DROP TABLE IF EXISTS applications CASCADE")
+            cur.execute("DROP TABLE IF EXISTS jobs CASCADE")
+            cur.execute("DROP TABLE IF EXISTS users CASCADE")
+            cur.execute("DROP TABLE IF EXISTS contacts CASCADE")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL CHECK (role IN ('freelancer', 'employer')),
+                company_name TEXT,
+                date_of_birth DATE
+            );
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id SERIAL PRIMARY KEY,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                salary DOUBLE PRECISION NOT NULL,
+                job_type TEXT NOT NULL,
+                employer_id INTEGER NOT NULL REFERENCES users(id)
+            );
+            """
+        )
+        # Full-text search: titles rank above descriptions; Postgres keeps the
+        # generated column current on every insert/update.
+        cur.execute(
+            """
+            ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', title), 'A') ||
+                setweight(to_tsvector('english', description), 'B')
+            ) STORED;
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS jobs_search_vector_idx ON jobs USING GIN (search_vector)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS applications (
+                id SERIAL PRIMARY KEY,
+                job_id INTEGER NOT NULL REFERENCES jobs(id),
+                freelancer_id INTEGER NOT NULL REFERENCES users(id),
+                cover_letter TEXT,
+                resume_path TEXT,
+                status TEXT DEFAULT 'applied' CHECK (status IN ('applied', 'approved', 'rejected')),
+                UNIQUE(job_id, freelancer_id)
+            );
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contacts (
+                id SERIAL PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            """
+        )
+        conn.commit()
+
+def insert_user(name: str, email: str, password: str, role: str, company_name: str = None, date_of_birth: str = None) -> Optional[int]:
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO users (name, email, password, role, company_name, date_of_birth)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (name, email, password, role, company_name, date_of_birth),
+            )
+            user_id = cur.fetchone()["id"]
+            conn.commit()
+            return user_id
+        except UniqueViolation:
+            conn.rollback()
+            return None
+
+def get_user_by_email(email: str) -> Optional[User]:
+    with get_db_connection() as conn:
+        cur = typed_cursor(conn, User)
+        cur.execute(
+            "SELECT id, name, email, password, role, company_name, date_of_birth FROM users WHERE email = %s",
+            (email,),
+            prepare=PREPARE_STATEMENTS,
+        )
+        user = cur.fetchone()
+        return user
+
+@cache.cached("users", local_only=True)
+def get_user_by_id(user_id: int) -> Optional[User]:
+    with get_db_connection() as conn:
+        cur = typed_cursor(conn, User)
+        cur.execute(USER_BY_ID_SQL, (user_id,), prepare=PREPARE_STATEMENTS)
+        user = cur.fetchone()
+        return user
+
+def _bump_versions(cur, scopes: Iterable[str]) -> None:
+    """Advance the data versions of scopes inside the caller's transaction.
+    Scopes are "jobs" (the public catalogue), "employer:<id>" and "freelancer:<id>".
+    Rows are locked in sorted order so concurrent writers cannot deadlock"""
+    _note_write()
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS contacts (
-            id SERIAL PRIMARY KEY,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL,
-            message TEXT NOT NULL
-        );
-        """
+        INSERT INTO data_versions (scope, version)
+        SELECT scope, nextval('data_version_seq') FROM unnest(%s::text[]) AS s(scope) ORDER BY scope
+        ON CONFLICT (scope) DO UPDATE SET version = EXCLUDED.version
+        """,
+        (sorted(set(scopes)),),
     )
-    conn.commit()
-    conn.close()
 
-def insert_user(name: str, email: str, password: str, role: str, company_name: str = None, date_of_birth: str = None) -> Optional[int]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+def get_data_versions(scopes: List[str]) -> tuple:
+    """Current version of each scope, in the order given (0 if never written)"""
+    with get_db_connection(read_only=True) as conn:
+        cur = conn.cursor()
+        cur.execute(DATA_VERSIONS_SQL, (list(scopes),), prepare=PREPARE_STATEMENTS)
+        versions = {row["scope"]: row["version"] for row in cur.fetchall()}
+    return tuple(versions.get(scope, 0) for scope in scopes)
+
+# Called after job writes commit, e.g. to keep recommend.py's index current
+_job_write_listeners: List[Callable[[Optional[int], Optional[dict]], None]] = []
+
+def on_job_write(listener: Callable[[Optional[int], Optional[dict]], None]) -> Callable:
+    """Register listener(job_id, job): job is the written row (id, title, description) or None
+    after a delete. job_id is None after a bulk write, meaning any job may have changed"""
+    _job_write_listeners.append(listener)
+    return listener
+
+def _notify_job_write(job_id: Optional[int], job: Optional[dict]) -> None:
+    for listener in _job_write_listeners:
+        try:
+            listener(job_id, job)
+        except Exception:
+            logger.exception("job write listener %r failed", listener)
+
+def insert_job(title: str, description: str, salary: float, job_type: str, employer_id: int) -> Optional[int]:
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO jobs (title, description, salary, job_type, employer_id)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (title, description, salary, job_type, employer_id),
+            )
+            job_id = cur.fetchone()["id"]
+            _bump_versions(cur, ["jobs", f"employer:{employer_id}"])
+            conn.commit()
+            cache.invalidate("jobs")
+            _notify_job_write(job_id, {"id": job_id, "title": title, "description": description})
+            return job_id
+        except Exception:
+            conn.rollback()
+            return None
+
+def update_job(job_id: int, title: str, description: str, salary: float, job_type: str, employer_id: int) -> bool:
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE jobs
+                SET title = %s, description = %s, salary = %s, job_type = %s
+                WHERE id = %s AND employer_id = %s
+                """,
+                (title, description, salary, job_type, job_id, employer_id),
+            )
+            if cur.rowcount > 0:
+                _bump_versions(cur, ["jobs", f"employer:{employer_id}"])
+            conn.commit()
+            if cur.rowcount > 0:
+                cache.invalidate("jobs")
+                _notify_job_write(job_id, {"id": job_id, "title": title, "description": description})
+            return cur.rowcount > 0
+        except Exception:
+            conn.rollback()
+            return False
+
+def delete_job(job_id: int, employer_id: int) -> bool:
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                DELETE FROM jobs
+                WHERE id = %s AND employer_id = %s
+                """,
+                (job_id, employer_id),
+            )
+            if cur.rowcount > 0:
+                _bump_versions(cur, ["jobs", f"employer:{employer_id}"])
+            conn.commit()
+            if cur.rowcount > 0:
+                cache.invalidate("jobs")
+                _notify_job_write(job_id, None)
+            return cur.rowcount > 0
+        except Exception:
+            conn.rollback()
+            return False
+
+def bulk_insert_jobs(rows: Iterable[tuple], employer_id: int) -> int:
+    """COPY (title, description, salary, job_type) rows in one transaction; returns the row count.
+    rows may be a generator, so nothing is held in memory. Any failure rolls the whole load back
+    and is re-raised"""
+    count = 0
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            with cur.copy("COPY jobs (title, description, salary, job_type, employer_id) FROM STDIN") as copy:
+                for title, description, salary, job_type in rows:
+                    copy.write_row((title, description, salary, job_type, employer_id))
+                    count += 1
+            if count:
+                _bump_versions(cur, ["jobs", f"employer:{employer_id}"])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    if count:
+        cache.invalidate("jobs")
+        _notify_job_write(None, None)
+    return count
+
+def get_jobs_by_employer(employer_id: int) -> List[EmployerJob]:
+    with get_db_connection(read_only=True) as conn:
+        cur = typed_cursor(conn, EmployerJob)
+        cur.execute(JOBS_BY_EMPLOYER_SQL, (employer_id,), prepare=PREPARE_STATEMENTS)
+        jobs = cur.fetchall()
+        return jobs
+
+@cache.cached("jobs")
+def get_all_jobs() -> List[Job]:
+    with get_db_connection() as conn:
+        cur = typed_cursor(conn, Job)
+        cur.execute("SELECT id, title, description, salary, job_type, employer_id FROM jobs")
+        jobs = cur.fetchall()
+        return jobs
+
+# The dashboard only links to the first few pages, so match counts are capped
+# at this many pages' worth of rows instead of counting the whole table.
+JOBS_PAGE_COUNT_CAP = 50
+
+JOB_LISTING_COLUMNS = """
+    j.id, j.title, j.description, j.salary, j.job_type, j.employer_id,
+    COALESCE(u.company_name, 'Unknown') AS company_name
+"""
+
+# (key used in URLs, label); the position is the value of job_salary_band() in
+# SQL, whose boundaries are defined in migration 4
+SALARY_BANDS = [
+    ("under-1k", "Under $1,000"),
+    ("1k-3k", "$1,000 - $3,000"),
+    ("3k-6k", "$3,000 - $6,000"),
+    ("6k-plus", "$6,000 and up"),
+]
+SALARY_BAND_INDEX = {key: index for index, (key, _) in enumerate(SALARY_BANDS)}
+JOB_TYPE_FACET_LIMIT = 12
+
+def _job_filters(job_type: Optional[str], salary_band: Optional[str]) -> tuple:
+    """SQL conditions (on jobs aliased j) and params for the listing filters"""
+    conditions, params = [], {}
+    if job_type:
+        conditions.append("j.job_type = %(job_type)s")
+        params["job_type"] = job_type
+    if salary_band in SALARY_BAND_INDEX:
+        conditions.append("job_salary_band(j.salary) = %(salary_band)s")
+        params["salary_band"] = SALARY_BAND_INDEX[salary_band]
+    return conditions, params
+
+def _where(conditions: List[str]) -> str:
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+def _count_capped(cur, matched_sql: str, params: dict, cap: int) -> int:
+    cur.execute(f"SELECT count(*) AS total FROM ({matched_sql} LIMIT %(count_cap)s) matched", {**params, "count_cap": cap + 1})
+    return cur.fetchone()["total"]
+
+def _page_offset(total: int, per_page: int, page: int) -> tuple:
+    total_pages = max(1, (min(total, per_page * JOBS_PAGE_COUNT_CAP) + per_page - 1) // per_page)
+    page = max(1, min(page, total_pages))
+    return page, (page - 1) * per_page
+
+def _listing_page(jobs: List[dict], per_page: int, page: Optional[int], total: int, cursor_of) -> dict:
+    cap = per_page * JOBS_PAGE_COUNT_CAP
+    return {
+        "jobs": jobs[:per_page],
+        "page": page,
+        "total": min(total, cap),
+        "total_capped": total > cap,
+        "next_cursor": cursor_of(jobs[per_page - 1]) if len(jobs) > per_page else None,
+    }
+
+@cache.cached("jobs")
+def get_jobs_page(per_page: int = 3, page: int = 1, after_id: Optional[int] = None,
+                  job_type: Optional[str] = None, salary_band: Optional[str] = None) -> dict:
+    """Get one page of jobs (with the employer's company name) in posting order.
+
+    With after_id set the page starts after that job id (keyset paging), otherwise
+    page is clamped to the available pages and used as an OFFSET. job_type and
+    salary_band (a SALARY_BANDS key) narrow the listing. Returns a dict with jobs,
+    page, total (capped at JOBS_PAGE_COUNT_CAP pages), total_capped and
+    next_cursor (the after_id of the following page, or None on the last page).
+    """
+    conditions, params = _job_filters(job_type, salary_band)
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        total = _count_capped(cur, f"SELECT 1 FROM jobs j {_where(conditions)}", params, per_page * JOBS_PAGE_COUNT_CAP)
+        if after_id is not None:
+            conditions, offset, page = conditions + ["j.id > %(after_id)s"], 0, None
+        else:
+            page, offset = _page_offset(total, per_page, page)
+        # A handful of filter combinations give a handful of statements, each prepared once
+        cur = typed_cursor(conn, JobListing)
+        cur.execute(
+            f"""
+            SELECT {JOB_LISTING_COLUMNS}
+            FROM jobs j
+            LEFT JOIN users u ON j.employer_id = u.id
+            {_where(conditions)}
+            ORDER BY j.id
+            LIMIT %(limit)s OFFSET %(offset)s
+            """,
+            {**params, "after_id": after_id, "limit": per_page + 1, "offset": offset},
+            prepare=PREPARE_STATEMENTS,
+        )
+        jobs = cur.fetchall()
+    return _listing_page(jobs, per_page, page, total, lambda job: job["id"])
+
+@cache.cached("jobs")
+def get_job_facets(job_type: Optional[str] = None, salary_band: Optional[str] = None) -> dict:
+    """Job counts per job type and per salary band, in one grouped query.
+
+    Type counts honour the salary band filter and band counts honour the job type
+    filter, so each count is what selecting that option would show. Returns
+    {"job_types": [{value, count}], "salary_bands": [{key, label, count}]}.
+    """
+    _, params = _job_filters(job_type, salary_band)
+    with get_db_connection() as conn:
+        cur = conn.cursor()
         cur.execute(
             """
-            INSERT INTO users (name, email, password, role, company_name, date_of_birth)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id
+            SELECT GROUPING(j.job_type) = 1 AS is_band, j.job_type, job_salary_band(j.salary) AS band,
+                   count(*) FILTER (WHERE %(salary_band)s::smallint IS NULL OR job_salary_band(j.salary) = %(salary_band)s) AS type_count,
+                   count(*) FILTER (WHERE %(job_type)s::text IS NULL OR j.job_type = %(job_type)s) AS band_count
+            FROM jobs j
+            GROUP BY GROUPING SETS ((j.job_type), (job_salary_band(j.salary)))
             """,
-            (name, email, password, role, company_name, date_of_birth),
+            {"job_type": params.get("job_type"), "salary_band": params.get("salary_band")},
         )
-        user_id = cur.fetchone()["id"]
-        conn.commit()
-        return user_id
-    except UniqueViolation:
-        conn.rollback()
+        rows = cur.fetchall()
+    band_counts = {row["band"]: row["band_count"] for row in rows if row["is_band"]}
+    job_types = sorted(
+        ({"value": row["job_type"], "count": row["type_count"]} for row in rows if not row["is_band"] and row["type_count"]),
+        key=lambda facet: (-facet["count"], facet["value"]),
+    )
+    return {
+        "job_types": job_types[:JOB_TYPE_FACET_LIMIT],
+        "salary_bands": [
+            {"key": key, "label": label, "count": band_counts.get(index, 0)}
+            for index, (key, label) in enumerate(SALARY_BANDS)
+        ],
+    }
+
+def _prefix_tsquery(text: str) -> Optional[str]:
+    """Turn free text into a to_tsquery() string matching every word as a prefix"""
+    words = re.findall(r"[^\W_]+", text.lower())
+    if not words:
         return None
-    finally:
-        conn.close()
-
-def get_user_by_email(email: str) -> Optional[dict]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, email, password, role, company_name, date_of_birth FROM users WHERE email = %s", (email,))
-    user = cur.fetchone()
-    conn.close()
-    return user
-
-def get_user_by_id(user_id: int) -> Optional[dict]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, email, password, role, company_name, date_of_birth FROM users WHERE id = %s", (user_id,))
-    user = cur.fetchone()
-    conn.close()
-    return user
+    return " & ".join(f"{word}:*" for word in words)
 
-def insert_job(title: str, description: str, salary: float, job_type: str, employer_id: int) -> Optional[int]:
-    conn = get_db_connection()
-    cur = conn.cursor()
+def _parse_search_cursor(cursor: Optional[str]) -> Optional[tuple]:
     try:
+        rank, job_id = cursor.split(":")
+        return float(rank), int(job_id)
+    except (AttributeError, ValueError):
+        return None
+
+@cache.cached("jobs")
+def search_jobs(query: str, limit: int = 10, cursor: Optional[str] = None, page: int = 1,
+                job_type: Optional[str] = None, salary_band: Optional[str] = None) -> dict:
+    """Full-text search over job titles (weighted higher) and descriptions, best matches first.
+
+    Every word is matched as a stemmed prefix, so partially typed words still match.
+    cursor is the next_cursor of the previous page ("rank:id"); without it page is
+    used as an OFFSET. job_type and salary_band filter as in get_jobs_page.
+    Returns the same dict shape as get_jobs_page.
+    """
+    tsquery = _prefix_tsquery(query)
+    if tsquery is None:
+        return _listing_page([], limit, page, 0, None)
+    conditions, params = _job_filters(job_type, salary_band)
+    params.update({"tsquery": tsquery, "limit": limit + 1})
+    filters = "".join(f" AND {condition}" for condition in conditions)
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        total = _count_capped(
+            cur,
+            f"SELECT 1 FROM jobs j WHERE j.search_vector @@ to_tsquery('english', %(tsquery)s){filters}",
+            params,
+            limit * JOBS_PAGE_COUNT_CAP,
+        )
+        after = _parse_search_cursor(cursor)
+        if after is not None:
+            where, offset, page = "WHERE rank < %(rank)s OR (rank = %(rank)s AND id > %(after_id)s)", 0, None
+            params["rank"], params["after_id"] = after
+        else:
+            where = ""
+            page, offset = _page_offset(total, limit, page)
+        cur = typed_cursor(conn, SearchResult)
+        cur.execute(
+            f"""
+            SELECT * FROM (
+                SELECT {JOB_LISTING_COLUMNS}, ts_rank_cd(j.search_vector, q.query)::float8 AS rank
+                FROM jobs j
+                CROSS JOIN to_tsquery('english', %(tsquery)s) AS q(query)
+                LEFT JOIN users u ON j.employer_id = u.id
+                WHERE j.search_vector @@ q.query{filters}
+            ) ranked
+            {where}
+            ORDER BY rank DESC, id
+            LIMIT %(limit)s OFFSET %(offset)s
+            """,
+            {**params, "offset": offset},
+        )
+        jobs = cur.fetchall()
+    return _listing_page(jobs, limit, page, total, lambda job: f"{job['rank']!r}:{job['id']}")
+
+@cache.cached("jobs")
+def suggest_jobs(prefix: str, limit: int = 5) -> List[dict]:
+    """Typeahead suggestions: ids and titles of the best prefix matches"""
+    tsquery = _prefix_tsquery(prefix)
+    if tsquery is None:
+        return []
+    with get_db_connection() as conn:
+        cur = conn.cursor()
         cur.execute(
             """
-            INSERT INTO jobs (title, description, salary, job_type, employer_id)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id
+            SELECT j.id, j.title
+            FROM jobs j, to_tsquery('english', %s) AS q(query)
+            WHERE j.search_vector @@ q.query
+            ORDER BY ts_rank_cd(j.search_vector, q.query) DESC, j.id
+            LIMIT %s
             """,
-            (title, description, salary, job_type, employer_id),
+            (tsquery, limit),
         )
-        job_id = cur.fetchone()["id"]
-        conn.commit()
-        return job_id
-    except Exception:
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+        return cur.fetchall()
 
-def update_job(job_id: int, title: str, description: str, salary: float, job_type: str, employer_id: int) -> bool:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+def insert_application(job_id: int, freelancer_id: int, cover_letter: str, resume_path: str, before_commit: Optional[Callable[[], None]] = None) -> bool:
+    """Insert an application; False if the freelancer already applied for the job.
+
+    before_commit runs after the row is inserted but before the transaction
+    commits (e.g. to publish the resume file); if it raises, nothing is saved.
+    """
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO applications (job_id, freelancer_id, cover_letter, resume_path)
+                VALUES (%s, %s, %s, %s)
+                RETURNING (SELECT employer_id FROM jobs WHERE id = job_id) AS employer_id
+                """,
+                (job_id, freelancer_id, cover_letter, resume_path),
+            )
+            _bump_versions(cur, [f"employer:{cur.fetchone()['employer_id']}", f"freelancer:{freelancer_id}"])
+            if before_commit:
+                before_commit()
+            conn.commit()
+            return True
+        except UniqueViolation:
+            conn.rollback()
+            return False
+
+def get_applications_for_employer(employer_id: int) -> List[Application]:
+    with get_db_connection(read_only=True) as conn:
+        cur = typed_cursor(conn, Application)
         cur.execute(
             """
-            UPDATE jobs
-            SET title = %s, description = %s, salary = %s, job_type = %s
-            WHERE id = %s AND employer_id = %s
+            SELECT a.id, a.job_id, a.freelancer_id, a.cover_letter, a.resume_path, a.status, u.name AS freelancer_name, u.email AS freelancer_email, j.title AS job_title
+            FROM applications a
+            JOIN users u ON a.freelancer_id = u.id
+            JOIN jobs j ON a.job_id = j.id
+            WHERE j.employer_id = %s
             """,
-            (title, description, salary, job_type, job_id, employer_id),
+            (employer_id,)
         )
-        conn.commit()
-        return cur.rowcount > 0
-    except Exception:
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
+        applications = cur.fetchall()
+        return applications
 
-def delete_job(job_id: int, employer_id: int) -> bool:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+def get_applications_for_job(job_id: int, employer_id: int, status: Optional[str] = None, after_id: Optional[int] = None, limit: int = 20) -> Optional[dict]:
+    """Get one page of a job's applications, or None if the employer does not own the job.
+
+    Ownership, the status filter and keyset paging (applications after after_id,
+    in id order) are resolved in a single statement. Returns a dict with job,
+    applications and next_cursor (the after_id of the following page, or None).
+    """
+    with get_db_connection(read_only=True) as conn:
+        cur = conn.cursor()
         cur.execute(
             """
-            DELETE FROM jobs
-            WHERE id = %s AND employer_id = %s
+            SELECT j.id AS job_id, j.title AS job_title, j.description AS job_description,
+                   j.salary AS job_salary, j.job_type AS job_job_type,
+                   a.id, a.freelancer_id, a.cover_letter, a.resume_path, a.status,
+                   a.freelancer_name, a.freelancer_email
+            FROM jobs j
+            LEFT JOIN LATERAL (
+                SELECT a.id, a.freelancer_id, a.cover_letter, a.resume_path, a.status,
+                       u.name AS freelancer_name, u.email AS freelancer_email
+                FROM applications a
+                JOIN users u ON a.freelancer_id = u.id
+                WHERE a.job_id = j.id
+                  AND (%(status)s::text IS NULL OR a.status = %(status)s)
+                  AND a.id > %(after_id)s
+                ORDER BY a.id
+                LIMIT %(limit)s
+            ) a ON true
+            WHERE j.id = %(job_id)s AND j.employer_id = %(employer_id)s
+            ORDER BY a.id
             """,
-            (job_id, employer_id),
+            {"job_id": job_id, "employer_id": employer_id, "status": status, "after_id": after_id or 0, "limit": limit + 1},
         )
-        conn.commit()
-        return cur.rowcount > 0
-    except Exception:
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
-
-def get_jobs_by_employer(employer_id: int) -> List[dict]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, title, description, salary, job_type FROM jobs WHERE employer_id = %s", (employer_id,))
-    jobs = cur.fetchall()
-    conn.close()
-    return jobs
-
-def get_all_jobs() -> List[dict]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, title, description, salary, job_type, employer_id FROM jobs")
-    jobs = cur.fetchall()
-    conn.close()
-    return jobs
-
-def insert_application(job_id: int, freelancer_id: int, cover_letter: str, resume_path: str) -> bool:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+        rows = cur.fetchall()
+    if not rows:
+        return None
+    first = rows[0]
+    job = {
+        "id": first["job_id"],
+        "title": first["job_title"],
+        "description": first["job_description"],
+        "salary": first["job_salary"],
+        "job_type": first["job_job_type"],
+    }
+    applications = [
+        {
+            "id": row["id"],
+            "job_id": row["job_id"],
+            "job_title": row["job_title"],
+            "freelancer_id": row["freelancer_id"],
+            "cover_letter": row["cover_letter"],
+            "resume_path": row["resume_path"],
+            "status": row["status"],
+            "freelancer_name": row["freelancer_name"],
+            "freelancer_email": row["freelancer_email"],
+        }
+        for row in rows
+        if row["id"] is not None
+    ]
+    return {
+        "job": job,
+        "applications": applications[:limit],
+        "next_cursor": applications[limit - 1]["id"] if len(applications) > limit else None,
+    }
+
+class KeysetPage:
+    """One keyset page whose rows are only fetched when it is iterated, so a streamed
+    template can send its first bytes before the query runs. Iterate it once;
+    next_cursor (the id the following page starts before, or None on the last page)
+    is known after that"""
+
+    def __init__(self, rows: Iterator, limit: int):
+        self._rows = rows
+        self._limit = limit
+        self.next_cursor = None
+
+    def __iter__(self):
+        try:
+            last = None
+            for count, row in enumerate(self._rows):
+                if count == self._limit:
+                    self.next_cursor = last.id
+                    break
+                last = row
+                yield row
+        finally:
+            self._rows.close()
+
+def _iter_freelancer_applications(freelancer_id: int, status: Optional[str], before_id: Optional[int],
+                                  limit: int) -> Iterator[FreelancerApplicationSummary]:
+    with get_db_connection(read_only=True) as conn:
+        cur = typed_cursor(conn, FreelancerApplicationSummary)
+        cur.execute(
+            """
+            SELECT a.id, a.job_id, a.status, j.title AS job_title, j.salary, j.job_type, u.company_name
+            FROM applications a
+            JOIN jobs j ON a.job_id = j.id
+            LEFT JOIN users u ON j.employer_id = u.id
+            WHERE a.freelancer_id = %(freelancer_id)s
+              AND (%(status)s::text IS NULL OR a.status = %(status)s)
+              AND (%(before_id)s::bigint IS NULL OR a.id < %(before_id)s)
+            ORDER BY a.id DESC
+            LIMIT %(limit)s
+            """,
+            {"freelancer_id": freelancer_id, "status": status, "before_id": before_id, "limit": limit},
+            prepare=PREPARE_STATEMENTS,
+        )
+        yield from cur
+
+def get_applications_for_freelancer(freelancer_id: int, status: Optional[str] = None, before_id: Optional[int] = None,
+                                    limit: int = 20) -> KeysetPage:
+    """One page of a freelancer's applications, newest first, optionally filtered by status.
+
+    Keyset paging returns the applications older than before_id. Rows leave out the
+    job description and cover letter (see get_freelancer_application), and the
+    query runs when the page is first iterated.
+    """
+    return KeysetPage(_iter_freelancer_applications(freelancer_id, status, before_id, limit + 1), limit)
+
+def get_freelancer_application(application_id: int, freelancer_id: int) -> Optional[FreelancerApplication]:
+    """One of the freelancer's applications with its cover letter and the full job, or None"""
+    with get_db_connection(read_only=True) as conn:
+        cur = typed_cursor(conn, FreelancerApplication)
         cur.execute(
             """
-            INSERT INTO applications (job_id, freelancer_id, cover_letter, resume_path)
-            VALUES (%s, %s, %s, %s)
+            SELECT a.id, a.job_id, a.freelancer_id, a.cover_letter, a.resume_path, a.status,
+                   j.title AS job_title, j.description, j.salary, j.job_type,
+                   u.company_name
+            FROM applications a
+            JOIN jobs j ON a.job_id = j.id
+            LEFT JOIN users u ON j.employer_id = u.id
+            WHERE a.id = %s AND a.freelancer_id = %s
             """,
-            (job_id, freelancer_id, cover_letter, resume_path),
+            (application_id, freelancer_id),
         )
+        return cur.fetchone()
+
+def reconcile_application_counts(batch_size: int = 10000) -> int:
+    """Recount job_application_counts from applications; returns how many jobs were off.
+    Works through jobs in id ranges, locking each range's counter rows so concurrent
+    application writes wait instead of racing the recount. The owners of corrected
+    jobs get their employer:<id> version bumped so dashboards stop revalidating to 304"""
+    fixed = 0
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MIN(id), 0) AS low, COALESCE(MAX(id), -1) AS high FROM jobs")
+        bounds = cur.fetchone()
         conn.commit()
-        return True
-    except UniqueViolation:
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
+        for low in range(bounds["low"], bounds["high"] + 1, batch_size):
+            params = {"low": low, "high": low + batch_size}
+            try:
+                cur.execute(
+                    """
+                    INSERT INTO job_application_counts (job_id)
+                    SELECT id FROM jobs WHERE id >= %(low)s AND id < %(high)s
+                    ON CONFLICT (job_id) DO NOTHING
+                    """,
+                    params,
+                )
+                cur.execute(
+                    "SELECT job_id FROM job_application_counts WHERE job_id >= %(low)s AND job_id < %(high)s FOR UPDATE",
+                    params,
+                )
+                cur.execute(
+                    """
+                    UPDATE job_application_counts c SET
+                        applied = actual.applied, approved = actual.approved, rejected = actual.rejected
+                    FROM (
+                        SELECT k.job_id,
+                               count(a.id) FILTER (WHERE a.status = 'applied') AS applied,
+                               count(a.id) FILTER (WHERE a.status = 'approved') AS approved,
+                               count(a.id) FILTER (WHERE a.status = 'rejected') AS rejected
+                        FROM job_application_counts k
+                        LEFT JOIN applications a ON a.job_id = k.job_id
+                        WHERE k.job_id >= %(low)s AND k.job_id < %(high)s
+                        GROUP BY k.job_id
+                    ) actual, jobs j
+                    WHERE c.job_id = actual.job_id
+                      AND j.id = c.job_id
+                      AND (c.applied, c.approved, c.rejected) IS DISTINCT FROM (actual.applied, actual.approved, actual.rejected)
+                    RETURNING c.job_id, j.employer_id
+                    """,
+                    params,
+                )
+                corrected = cur.fetchall()
+                if corrected:
+                    _bump_versions(cur, [f"employer:{row['employer_id']}" for row in corrected])
+                fixed += len(corrected)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    return fixed
 
-def get_applications_for_employer(employer_id: int) -> List[dict]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT a.id, a.job_id, a.freelancer_id, a.cover_letter, a.resume_path, a.status, u.name AS freelancer_name, u.email AS freelancer_email, j.title AS job_title
-        FROM applications a
-        JOIN users u ON a.freelancer_id = u.id
-        JOIN jobs j ON a.job_id = j.id
-        WHERE j.employer_id = %s
-        """,
-        (employer_id,)
-    )
-    applications = cur.fetchall()
-    conn.close()
-    return applications
-
-def get_applications_for_freelancer(freelancer_id: int) -> List[dict]:
-    """Get all applications for a specific freelancer with job details"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT a.id, a.job_id, a.freelancer_id, a.cover_letter, a.resume_path, a.status,
-               j.title AS job_title, j.description, j.salary, j.job_type,
-               u.company_name
-        FROM applications a
-        JOIN jobs j ON a.job_id = j.id
-        LEFT JOIN users u ON j.employer_id = u.id
-        WHERE a.freelancer_id = %s
-        """,
-        (freelancer_id,)
-    )
-    applications = cur.fetchall()
-    conn.close()
-    return applications
+APPLICANT_EXPORT_COLUMNS = [
+    "application_id", "job_id", "job_title", "freelancer_id", "freelancer_name", "freelancer_email", "status", "cover_letter",
+]
 
-def get_application_by_id(application_id: int) -> Optional[dict]:
-    """Get a specific application by ID with freelancer details"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT a.id, a.job_id, a.freelancer_id, a.cover_letter, a.resume_path, a.status,
-               u.name AS freelancer_name, u.email AS freelancer_email
-        FROM applications a
-        JOIN users u ON a.freelancer_id = u.id
-        WHERE a.id = %s
-        """,
-        (application_id,)
-    )
-    application = cur.fetchone()
-    conn.close()
-    return application
+def iter_applicants_for_export(employer_id: int, job_id: Optional[int] = None, statuses: Optional[List[str]] = None,
+                               batch_size: int = 2000) -> Iterator[List[tuple]]:
+    """Stream an employer's applicants (APPLICANT_EXPORT_COLUMNS tuples) in batches, in job
+    then application order, through a server-side cursor so memory stays flat however
+    many there are. job_id and statuses narrow the export; check job ownership first,
+    since a job the employer does not own just yields nothing"""
+    with get_db_connection(read_only=True) as conn:
+        with conn.transaction():
+            with conn.cursor(name="export_applicants", row_factory=tuple_row) as cur:
+                cur.execute(
+                    """
+                    SELECT a.id, a.job_id, j.title, a.freelancer_id, u.name, u.email, a.status, a.cover_letter
+                    FROM jobs j
+                    JOIN applications a ON a.job_id = j.id
+                    JOIN users u ON a.freelancer_id = u.id
+                    WHERE j.employer_id = %(employer_id)s
+                      AND (%(job_id)s::int IS NULL OR j.id = %(job_id)s)
+                      AND (%(statuses)s::text[] IS NULL OR a.status = ANY(%(statuses)s))
+                    ORDER BY a.job_id, a.id
+                    """,
+                    {"employer_id": employer_id, "job_id": job_id, "statuses": statuses or None},
+                )
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
 
-def get_job_by_id(job_id: int) -> Optional[dict]:
-    """Get a specific job by ID"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, title, description, salary, job_type, employer_id FROM jobs WHERE id = %s", (job_id,))
-    job = cur.fetchone()
-    conn.close()
-    return job
+def get_freelancer_profile(freelancer_id: int, limit: int = 50) -> List[dict]:
+    """job_id and cover_letter of a freelancer's most recent applications"""
+    with get_db_connection(read_only=True) as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT job_id, cover_letter FROM applications WHERE freelancer_id = %s ORDER BY id DESC LIMIT %s",
+            (freelancer_id, limit),
+        )
+        return cur.fetchall()
 
-def update_application_status(application_id: int, status: str) -> bool:
-    """Update the status of an application"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+def iter_job_texts(batch_size: int = 10000) -> Iterator[List[dict]]:
+    """Stream (id, title, description) of every job in batches via a server-side cursor"""
+    with get_db_connection(read_only=True) as conn:
+        with conn.transaction():
+            with conn.cursor(name="iter_job_texts") as cur:
+                cur.execute("SELECT id, title, description FROM jobs ORDER BY id")
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+def get_jobs_by_ids(job_ids: List[int]) -> List[JobListing]:
+    """Listing rows for job_ids, in the order given; missing ids are skipped"""
+    if not job_ids:
+        return []
+    with get_db_connection(read_only=True) as conn:
+        cur = typed_cursor(conn, JobListing)
+        cur.execute(
+            f"""
+            SELECT {JOB_LISTING_COLUMNS}
+            FROM jobs j
+            LEFT JOIN users u ON j.employer_id = u.id
+            WHERE j.id = ANY(%s)
+            """,
+            (list(job_ids),),
+        )
+        by_id = {job["id"]: job for job in cur.fetchall()}
+        return [by_id[job_id] for job_id in job_ids if job_id in by_id]
+
+def get_application_by_id(application_id: int) -> Optional[dict]:
+    """Get a specific application by ID with freelancer details"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
         cur.execute(
             """
-            UPDATE applications
-            SET status = %s
-            WHERE id = %s
+            SELECT a.id, a.job_id, a.freelancer_id, a.cover_letter, a.resume_path, a.status,
+                   u.name AS freelancer_name, u.email AS freelancer_email
+            FROM applications a
+            JOIN users u ON a.freelancer_id = u.id
+            WHERE a.id = %s
             """,
-            (status, application_id)
+            (application_id,)
         )
-        conn.commit()
-        return cur.rowcount > 0
-    except Exception:
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
+        application = cur.fetchone()
+        return application
 
-def insert_contact(name: str, email: str, message: str) -> Optional[int]:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+def get_application_for_employer(application_id: int, employer_id: int) -> Optional[dict]:
+    """Get an application only if it is for one of the employer's jobs"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
         cur.execute(
             """
-            INSERT INTO contacts (name, email, message)
-            VALUES (%s, %s, %s)
-            RETURNING id
+            SELECT a.id, a.job_id, a.freelancer_id, a.resume_path, a.status,
+                   u.name AS freelancer_name, u.email AS freelancer_email
+            FROM applications a
+            JOIN jobs j ON a.job_id = j.id
+            JOIN users u ON a.freelancer_id = u.id
+            WHERE a.id = %s AND j.employer_id = %s
             """,
-            (name, email, message)
+            (application_id, employer_id),
         )
-        contact_id = cur.fetchone()[0]
-        conn.commit()
-        return contact_id
-    except Exception:
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
\ No newline at end of file
+        return cur.fetchone()
+
+@cache.cached("jobs")
+def get_job_by_id(job_id: int) -> Optional[Job]:
+    """Get a specific job by ID"""
+    with get_db_connection() as conn:
+        cur = typed_cursor(conn, Job)
+        cur.execute(JOB_BY_ID_SQL, (job_id,), prepare=PREPARE_STATEMENTS)
+        job = cur.fetchone()
+        return job
+
+def get_referenced_resume_paths(paths: List[str]) -> set:
+    """Return the subset of paths that some application still points at"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT DISTINCT resume_path FROM applications WHERE resume_path = ANY(%s)", (paths,))
+        return {row["resume_path"] for row in cur.fetchall()}
+
+def get_job_for_employer(job_id: int, employer_id: int) -> Optional[dict]:
+    """Get a job only if it belongs to the given employer"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, title, description, salary, job_type FROM jobs WHERE id = %s AND employer_id = %s",
+            (job_id, employer_id),
+        )
+        return cur.fetchone()
+
+def update_application_status(application_id: int, status: str) -> bool:
+    """Update the status of an application"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE applications
+                SET status = %s
+                WHERE id = %s
+                RETURNING freelancer_id, (SELECT employer_id FROM jobs WHERE id = job_id) AS employer_id
+                """,
+                (status, application_id)
+            )
+            row = cur.fetchone()
+            if row:
+                _bump_versions(cur, [f"employer:{row['employer_id']}", f"freelancer:{row['freelancer_id']}"])
+            conn.commit()
+            return row is not None
+        except Exception:
+            conn.rollback()
+            return False
+
+def update_application_statuses(application_ids: List[int], status: str, employer_id: int) -> dict:
+    """Set status on every application of employer_id's jobs among application_ids in one statement.
+    Returns {application_id: "updated" | "not_found"}; ids that don't exist or belong to
+    another employer's job are "not_found". Ids must fit a Postgres integer. Any failure
+    rolls the update back and is re-raised"""
+    if not application_ids:
+        return {}
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                WITH requested AS (
+                    SELECT DISTINCT unnest(%(ids)s::int[]) AS id
+                ), updated AS (
+                    UPDATE applications a
+                    SET status = %(status)s
+                    FROM jobs j
+                    WHERE a.id = ANY(%(ids)s) AND a.job_id = j.id AND j.employer_id = %(employer_id)s
+                    RETURNING a.id, a.freelancer_id
+                )
+                SELECT requested.id, updated.freelancer_id
+                FROM requested
+                LEFT JOIN updated ON updated.id = requested.id
+                """,
+                {"ids": list(application_ids), "status": status, "employer_id": employer_id},
+            )
+            rows = cur.fetchall()
+            outcomes = {row["id"]: "updated" if row["freelancer_id"] is not None else "not_found" for row in rows}
+            freelancers = {row["freelancer_id"] for row in rows if row["freelancer_id"] is not None}
+            if freelancers:
+                _bump_versions(cur, [f"employer:{employer_id}"] + [f"freelancer:{i}" for i in freelancers])
+            conn.commit()
+            return outcomes
+        except Exception:
+            conn.rollback()
+            raise
+
+def insert_contact(name: str, email: str, message: str) -> Optional[int]:
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO contacts (name, email, message)
+                VALUES (%s, %s, %s)
+                RETURNING id
+                """,
+                (name, email, message)
+            )
+            contact_id = cur.fetchone()["id"]
+            conn.commit()
+            return contact_id
+        except Exception:
+            conn.rollback()
+            return None
+
+def insert_contacts(rows: List[dict]) -> int:
+    """Insert spooled contact messages in one transaction and return how many were new.
+
+    Rows already stored under their submission_id are skipped, so a batch can be
+    retried safely. Errors are raised so the caller keeps the batch.
+    """
+    if not rows:
+        return 0
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.executemany(
+                """
+                INSERT INTO contacts (submission_id, name, email, message, submitted_at)
+                VALUES (%(submission_id)s, %(name)s, %(email)s, %(message)s, %(submitted_at)s)
+                ON CONFLICT (submission_id) DO NOTHING
+                """,
+                rows,
+            )
+            inserted = cur.rowcount
+            conn.commit()
+            return inserted
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,51 @@
+"""Streamed applicant exports (CSV or JSON Lines).
+
+stream_applicants() yields the export as text chunks while the rows arrive
+from db.iter_applicants_for_export's server-side cursor. Memory stays flat
+whatever the number of applicants, and a CSV's header row goes out before the
+query runs. The format follows importer.py: CSV with a header row, or one JSON
+object per line.
+"""
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List, Optional
+import db
+
+FORMATS = ("csv", "jsonl")
+MIMETYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+STATUSES = ("applied", "approved", "rejected")
+
+# Spreadsheets run cells starting with these as formulas (CSV injection)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(batches: Iterable[List[tuple]], columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(batches: Iterable[List[tuple]], columns: List[str]) -> Iterator[str]:
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+def stream_applicants(fmt: str, employer_id: int, job_id: Optional[int] = None,
+                      statuses: Optional[List[str]] = None) -> Iterator[str]:
+    """Export chunks of the employer's applicants; job ownership must already be checked"""
+    batches = db.iter_applicants_for_export(employer_id, job_id=job_id, statuses=statuses)
+    chunks = csv_chunks if fmt == "csv" else jsonl_chunks
+    return chunks(batches, db.APPLICANT_EXPORT_COLUMNS)
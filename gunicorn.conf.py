@@ -0,0 +1,44 @@
+"""Production gunicorn profile; gunicorn reads ./gunicorn.conf.py by default.
+
+    gunicorn            # or: gunicorn -c gunicorn.conf.py
+
+The master imports the app once (preload_app) and forks the workers from it,
+so imports and template loading are paid once and shared copy-on-write.
+create_app() opens no connections, so nothing database-related crosses the
+fork. Each worker opens its own pool and warms up in post_fork, before it
+accepts requests. If the schema is at the wrong version, warm-up raises, the
+worker fails to boot and gunicorn shuts down instead of serving.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "app:app"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5001')}")
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# Recycle workers now and then to cap slow leaks; the jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+# Warm-up runs before the worker's first heartbeat, so keep it well inside timeout
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+
+def post_fork(server, worker):
+    import app
+
+    if app.warm_up():
+        server.log.info("worker %s warmed up", worker.pid)
+    else:
+        server.log.warning("worker %s started cold; /readyz reports not ready until warm-up succeeds", worker.pid)
+
+
+def worker_exit(server, worker):
+    import db
+
+    # Hand the connections back to Postgres now rather than when they time out.
+    # Spooled contact messages are safe on disk and the other workers flush them.
+    db.close_pool()
@@ -0,0 +1,74 @@
+"""Liveness and readiness probes.
+
+GET /healthz answers 200 whenever the process can serve a request at all. It
+touches nothing else, so a database outage never gets workers restarted.
+
+GET /readyz answers 200 only when this worker can serve pages. That means it
+has finished warm-up (app.warm_up), the database answers within READY_TIMEOUT
+seconds, and the schema is at migrations.SCHEMA_VERSION. Otherwise it answers
+503, with the failed checks in the JSON body, so the load balancer holds
+traffic back while a worker boots or the database is unreachable. A worker
+that has not warmed up retries warm-up from the probe.
+"""
+import os
+from functools import partial
+from typing import Callable
+import db
+from migrations import check_schema_version
+
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", 2))
+
+# The schema only moves forward, so once it matched there is no need to ask again
+_schema_ok = False
+
+
+def _check_warm_up(warm_up: Callable[[float], bool]) -> None:
+    if not warm_up(READY_TIMEOUT):
+        raise RuntimeError("warm-up did not complete, see the worker log")
+
+
+def _check_database() -> None:
+    with db.get_pool().connection(timeout=READY_TIMEOUT) as conn:
+        conn.execute("SELECT 1")
+
+
+def _check_schema() -> None:
+    global _schema_ok
+    if not _schema_ok:
+        check_schema_version()
+        _schema_ok = True
+
+
+def readiness(warm_up: Callable[[float], bool]) -> dict:
+    """{check name: "ok" or the error} for warm-up, database and schema"""
+    checks = {}
+    for name, check in (
+        ("warm_up", partial(_check_warm_up, warm_up)),
+        ("database", _check_database),
+        ("schema", _check_schema),
+    ):
+        try:
+            check()
+            checks[name] = "ok"
+        except Exception as e:
+            checks[name] = f"{type(e).__name__}: {e}"
+    return checks
+
+
+def init_app(app, warm_up: Callable[[float], bool]) -> None:
+    """Serve GET /healthz and GET /readyz"""
+    from flask import jsonify
+
+    def healthz():
+        return jsonify({"status": "ok"})
+
+    def readyz():
+        checks = readiness(warm_up)
+        ready = all(result == "ok" for result in checks.values())
+        response = jsonify({"status": "ready" if ready else "not ready", "checks": checks})
+        response.status_code = 200 if ready else 503
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    app.add_url_rule("/healthz", "healthz", healthz)
+    app.add_url_rule("/readyz", "readyz", readyz)
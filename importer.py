@@ -0,0 +1,157 @@
+"""Bulk job import from CSV or JSONL.
+
+The input is parsed as a stream and validated in batches. Valid rows are sent
+straight into a single COPY (db.bulk_insert_jobs), so the whole file loads in
+one transaction without being held in memory. Invalid rows are skipped and
+reported with their row number.
+
+    python importer.py --employer-id 12 jobs.csv
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+if __name__ == "__main__":
+    # Run as a script: load .env before db reads its settings at import
+    from dotenv import load_dotenv
+    load_dotenv()
+import db
+
+FIELDS = ("title", "description", "salary", "job_type")
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 1000
+# Every bad row is counted, but only the first ones are listed in the report
+MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", 200))
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", 50 * 1024 * 1024))
+
+
+def detect_format(filename: str) -> Optional[str]:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(extension)
+
+
+def parse_rows(text: Iterable[str], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (row number, raw fields or None, parse error or None) from a line stream"""
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        missing = [field for field in FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            yield 1, None, f"header is missing column(s): {', '.join(missing)}"
+            return
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "expected a JSON object"
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f"unsupported format {fmt!r}")
+
+
+def validate_row(row: dict) -> Tuple[Optional[tuple], Optional[str]]:
+    """Return ((title, description, salary, job_type), None) or (None, error)"""
+    values = {}
+    for field in ("title", "description", "job_type"):
+        value = row.get(field)
+        value = value.strip() if isinstance(value, str) else value
+        if not value or not isinstance(value, str):
+            return None, f"{field} is required"
+        if db.UNSTORABLE_TEXT.search(value):
+            return None, f"{field} contains characters that cannot be stored (NUL or invalid Unicode)"
+        values[field] = value
+    try:
+        if isinstance(row.get("salary"), bool):
+            raise TypeError
+        salary = float(row.get("salary"))
+    except (TypeError, ValueError):
+        return None, "salary must be a number"
+    if not math.isfinite(salary) or salary <= 0:
+        return None, "salary must be a positive number"
+    return (values["title"], values["description"], salary, values["job_type"]), None
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.error_count = 0
+        self.errors: List[dict] = []
+
+    def add_error(self, row_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def as_dict(self) -> dict:
+        return {"imported": self.imported, "error_count": self.error_count, "errors": self.errors}
+
+
+def _valid_rows(parsed, report: ImportReport) -> Iterator[tuple]:
+    while True:
+        batch = list(islice(parsed, BATCH_SIZE))
+        if not batch:
+            return
+        for row_number, raw, error in batch:
+            if error is None:
+                values, error = validate_row(raw)
+            if error is not None:
+                report.add_error(row_number, error)
+                continue
+            yield values
+
+
+def import_jobs(text: Iterable[str], fmt: str, employer_id: int) -> dict:
+    """Import jobs for employer_id from a line stream; returns imported/error_count/errors.
+    Nothing is imported if the stream itself is unreadable (bad encoding, broken CSV quoting)"""
+    report = ImportReport()
+    try:
+        report.imported = db.bulk_insert_jobs(_valid_rows(parse_rows(text, fmt), report), employer_id)
+    except csv.Error as e:
+        raise ValueError(f"malformed CSV: {e}") from e
+    return report.as_dict()
+
+
+def import_upload(upload, employer_id: int, fmt: Optional[str] = None) -> dict:
+    """Import a werkzeug FileStorage without reading it into memory"""
+    fmt = fmt or detect_format(upload.filename)
+    if fmt not in FORMATS:
+        raise ValueError("Upload a .csv or .jsonl file.")
+    text = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    return import_jobs(text, fmt, employer_id)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-import jobs for an employer")
+    parser.add_argument("path", help="CSV (with a title,description,salary,job_type header) or JSONL file")
+    parser.add_argument("--employer-id", type=int, required=True)
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+    employer = db.get_user_by_id(args.employer_id)
+    if not employer or employer["role"] != "employer":
+        parser.error(f"user {args.employer_id} is not an employer")
+    with open(args.path, encoding="utf-8-sig", newline="") as f:
+        report = import_jobs(f, fmt, args.employer_id)
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+    print(f"Imported {report['imported']} job(s); {report['error_count']} row(s) rejected")
+    return 1 if report["error_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
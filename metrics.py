@@ -0,0 +1,334 @@
+"""Request and database metrics, exported in the Prometheus text format.
+
+Every statement run through the db.py and adb.py cursors is timed with
+record_query(). The time is added to the global query histogram and to the
+RequestStats of the current request (query count, DB time, connection acquire
+time and how often each statement ran). At the end of a request, statements
+that ran N_PLUS_ONE_THRESHOLD times or more are logged as a likely N+1.
+Statements slower than SLOW_QUERY_MS are logged in normalized form, with a
+fingerprint of their parameters instead of the values.
+
+init_app(app) wraps the WSGI app to time every request and serves GET
+/metrics. A request is recorded when the server closes its response, so
+streamed pages include the queries they run while streaming, and requests
+that fail with an unhandled exception (even halfway through a stream) are
+recorded with status 500. Each gunicorn worker keeps its own numbers, so
+scrape every worker or compare rates rather than absolute totals.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; without a token it
+# answers 404 unless METRICS_PUBLIC=1 (e.g. when only a private network reaches it)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC") == "1"
+
+logger = logging.getLogger("joblynk.metrics")
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+_gauge_sources: List[Tuple[str, str, Callable[[], dict]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = sorted(self._values.items(), key=lambda item: item[0])
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with _lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items) -> Iterable[str]:
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float], labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_samples(self, items) -> Iterable[str]:
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_number(float(bound)) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_number(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+def register_gauges(prefix: str, help_text: str, source: Callable[[], dict]) -> None:
+    """Export each numeric value of source() as the gauge <prefix>_<key> at scrape time"""
+    _gauge_sources.append((prefix, help_text, source))
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "joblynk_http_request_duration_seconds", "Time to build a response, per route",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), labels=("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "joblynk_request_db_queries", "Statements executed per request", (0, 1, 2, 3, 5, 10, 20, 50, 100), labels=("route",),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "joblynk_request_db_seconds", "Database time per request", (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5), labels=("route",),
+)
+DB_QUERY_SECONDS = Histogram(
+    "joblynk_db_query_duration_seconds", "Time per statement",
+    (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+DB_ACQUIRE_SECONDS = Histogram(
+    "joblynk_db_connection_acquire_seconds", "Time waiting for a pooled connection (including opening one)",
+    (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10), labels=("pool",),
+)
+SLOW_QUERIES = Counter("joblynk_db_slow_queries_total", f"Statements slower than SLOW_QUERY_MS ({SLOW_QUERY_MS:g} ms)")
+N_PLUS_ONE = Counter("joblynk_n_plus_one_total", "Requests that repeated one statement N_PLUS_ONE_THRESHOLD times or more", labels=("route",))
+
+
+class RequestStats:
+    """Database work done while serving one request"""
+
+    __slots__ = ("queries", "db_seconds", "acquire_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.acquire_seconds = 0.0
+        self.statements: Dict[str, int] = defaultdict(int)
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def start_request_stats(stats: Optional[RequestStats] = None) -> RequestStats:
+    """Attribute statements run in this context to stats (a fresh RequestStats by default)"""
+    stats = RequestStats() if stats is None else stats
+    _request_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql) -> str:
+    """Collapse whitespace and replace literals with ?, so equivalent statements look alike"""
+    return _WHITESPACE.sub(" ", _LITERALS.sub("?", str(sql))).strip()
+
+
+def fingerprint(value) -> str:
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:12]
+
+
+def record_query(query, params, seconds: float) -> None:
+    """Account for one executed statement"""
+    if not query:  # the pool's health check runs ""
+        return
+    DB_QUERY_SECONDS.observe(seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+        stats.statements[query if isinstance(query, str) else str(query)] += 1
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        statement = normalize_sql(query)
+        logger.warning(
+            "slow query %.1f ms statement=%s params=%s: %s",
+            seconds * 1000, fingerprint(statement), fingerprint(params) if params is not None else "-", statement,
+        )
+
+
+def record_acquire(seconds: float, pool: str = "sync") -> None:
+    DB_ACQUIRE_SECONDS.observe(seconds, pool=pool)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.acquire_seconds += seconds
+
+
+def finish_request(stats: RequestStats, route: str) -> None:
+    """Record a finished request's DB totals and flag repeated statements"""
+    REQUEST_QUERIES.observe(stats.queries, route=route)
+    REQUEST_DB_SECONDS.observe(stats.db_seconds, route=route)
+    repeated = [(count, sql) for sql, count in stats.statements.items() if count >= N_PLUS_ONE_THRESHOLD]
+    if repeated:
+        N_PLUS_ONE.inc(route=route)
+        for count, sql in sorted(repeated, reverse=True):
+            statement = normalize_sql(sql)
+            logger.warning("possible N+1 on %s: ran %d times statement=%s: %s", route, count, fingerprint(statement), statement)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for prefix, help_text, source in _gauge_sources:
+        try:
+            values = source() or {}
+        except Exception:
+            logger.exception("metrics source %s failed", prefix)
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                value = int(value) if isinstance(value, bool) else None
+            if value is None:
+                continue
+            name = f"{prefix}_{key}"
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_number(value)}"])
+    return "\n".join(lines) + "\n"
+
+
+_STATS_KEY = "joblynk.request_stats"
+_ROUTE_KEY = "joblynk.route"
+
+
+class _RecordedBody:
+    """Response body that records its request once the server has closed it"""
+
+    def __init__(self, body, finish: Callable[[bool], None]):
+        self._body = body
+        self._finish = finish
+        self._failed = False
+
+    def __iter__(self):
+        try:
+            yield from self._body
+        except BaseException:
+            self._failed = True
+            raise
+
+    def close(self) -> None:
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._finish(self._failed)
+
+
+class RequestMetricsMiddleware:
+    """WSGI middleware that times each request until its response is closed"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        started = time.perf_counter()
+        environ[_STATS_KEY] = start_request_stats()
+        status = ["500"]
+
+        def recording_start_response(status_line, headers, exc_info=None):
+            status[0] = status_line.split(" ", 1)[0]
+            return start_response(status_line, headers, exc_info)
+
+        def finish(failed: bool) -> None:
+            route = environ.get(_ROUTE_KEY, "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=environ.get("REQUEST_METHOD", ""), route=route,
+                status="500" if failed else status[0],
+            )
+            finish_request(environ[_STATS_KEY], route)
+
+        try:
+            body = self.wsgi_app(environ, recording_start_response)
+        except BaseException:
+            finish(True)
+            raise
+        file_wrapper = environ.get("wsgi.file_wrapper")
+        if isinstance(file_wrapper, type) and isinstance(body, file_wrapper):
+            # Keep the server's sendfile path; the file is sent after the app is done with it
+            finish(False)
+            return body
+        return _RecordedBody(body, finish)
+
+
+def init_app(app) -> None:
+    """Time every request and serve GET /metrics"""
+    from flask import Response, g, request
+
+    app.wsgi_app = RequestMetricsMiddleware(app.wsgi_app)
+
+    @app.before_request
+    def start_request_metrics():
+        request.environ[_ROUTE_KEY] = request.url_rule.rule if request.url_rule else "unmatched"
+        g.request_stats = request.environ.get(_STATS_KEY) or start_request_stats()
+
+    def metrics_view():
+        if METRICS_TOKEN:
+            if request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+                return Response("Unauthorized\n", status=401, mimetype="text/plain")
+        elif not METRICS_PUBLIC:
+            return Response("Not Found\n", status=404, mimetype="text/plain")
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,267 @@
+"""Versioned schema migrations.
+
+Run `python migrations.py` once per deploy to bring the database up to
+SCHEMA_VERSION (`python migrations.py status` shows where it is). The app
+itself never runs DDL; /readyz fails while the recorded version differs.
+`python migrations.py reconcile` recounts the trigger-maintained application
+counts (migration 3) from the applications table, e.g. from a nightly cron job.
+
+A migration is either a function that does its own transactional work, or a
+list of statements run one by one in autocommit mode (needed for CREATE INDEX
+CONCURRENTLY). If a concurrent index build fails it leaves an INVALID index
+behind; drop it before re-running, since IF NOT EXISTS would skip it.
+"""
+import argparse
+import sys
+from typing import Optional
+from psycopg import connect
+from psycopg.errors import UndefinedTable
+if __name__ == "__main__":
+    # Run as a script: load .env before db reads its settings at import
+    from dotenv import load_dotenv
+    load_dotenv()
+import db
+
+def add_application_counts() -> None:
+    """Per-job application counts by status, kept current by triggers and backfilled"""
+    with db.get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_application_counts (
+                job_id INTEGER PRIMARY KEY REFERENCES jobs(id) ON DELETE CASCADE,
+                applied INTEGER NOT NULL DEFAULT 0,
+                approved INTEGER NOT NULL DEFAULT 0,
+                rejected INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Statement-level triggers with transition tables add up a whole COPY or
+        # batch update per job instead of firing once per row. plpgsql plans a
+        # branch only when it runs, so each one can use the table its event has.
+        cur.execute(
+            """
+            CREATE OR REPLACE FUNCTION job_application_counts_sync() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO job_application_counts AS c (job_id, applied, approved, rejected)
+                    SELECT job_id,
+                           count(*) FILTER (WHERE status = 'applied'),
+                           count(*) FILTER (WHERE status = 'approved'),
+                           count(*) FILTER (WHERE status = 'rejected')
+                    FROM new_rows GROUP BY job_id
+                    ON CONFLICT (job_id) DO UPDATE SET
+                        applied = c.applied + EXCLUDED.applied,
+                        approved = c.approved + EXCLUDED.approved,
+                        rejected = c.rejected + EXCLUDED.rejected;
+                ELSIF TG_OP = 'DELETE' THEN
+                    UPDATE job_application_counts c SET
+                        applied = c.applied - d.applied,
+                        approved = c.approved - d.approved,
+                        rejected = c.rejected - d.rejected
+                    FROM (
+                        SELECT job_id,
+                               count(*) FILTER (WHERE status = 'applied') AS applied,
+                               count(*) FILTER (WHERE status = 'approved') AS approved,
+                               count(*) FILTER (WHERE status = 'rejected') AS rejected
+                        FROM old_rows GROUP BY job_id
+                    ) d
+                    WHERE c.job_id = d.job_id;
+                ELSE
+                    INSERT INTO job_application_counts AS c (job_id, applied, approved, rejected)
+                    SELECT * FROM (
+                        SELECT job_id,
+                               COALESCE(sum(n) FILTER (WHERE status = 'applied'), 0) AS applied,
+                               COALESCE(sum(n) FILTER (WHERE status = 'approved'), 0) AS approved,
+                               COALESCE(sum(n) FILTER (WHERE status = 'rejected'), 0) AS rejected
+                        FROM (
+                            SELECT job_id, status, 1 AS n FROM new_rows
+                            UNION ALL
+                            SELECT job_id, status, -1 FROM old_rows
+                        ) changes
+                        GROUP BY job_id
+                    ) d
+                    WHERE (applied, approved, rejected) <> (0, 0, 0)
+                    ON CONFLICT (job_id) DO UPDATE SET
+                        applied = c.applied + EXCLUDED.applied,
+                        approved = c.approved + EXCLUDED.approved,
+                        rejected = c.rejected + EXCLUDED.rejected;
+                END IF;
+                RETURN NULL;
+            END
+            $$
+            """
+        )
+        # Block application writes until the triggers exist and the backfill is
+        # done, so no change is counted twice or missed
+        cur.execute("LOCK TABLE applications IN SHARE ROW EXCLUSIVE MODE")
+        cur.execute("DROP TRIGGER IF EXISTS applications_count_insert ON applications")
+        cur.execute("DROP TRIGGER IF EXISTS applications_count_update ON applications")
+        cur.execute("DROP TRIGGER IF EXISTS applications_count_delete ON applications")
+        cur.execute(
+            """
+            CREATE TRIGGER applications_count_insert AFTER INSERT ON applications
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION job_application_counts_sync()
+            """
+        )
+        cur.execute(
+            """
+            CREATE TRIGGER applications_count_update AFTER UPDATE ON applications
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION job_application_counts_sync()
+            """
+        )
+        cur.execute(
+            """
+            CREATE TRIGGER applications_count_delete AFTER DELETE ON applications
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION job_application_counts_sync()
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO job_application_counts (job_id, applied, approved, rejected)
+            SELECT job_id,
+                   count(*) FILTER (WHERE status = 'applied'),
+                   count(*) FILTER (WHERE status = 'approved'),
+                   count(*) FILTER (WHERE status = 'rejected')
+            FROM applications GROUP BY job_id
+            ON CONFLICT (job_id) DO UPDATE SET
+                applied = EXCLUDED.applied, approved = EXCLUDED.approved, rejected = EXCLUDED.rejected
+            """
+        )
+        conn.commit()
+
+MIGRATIONS = [
+    (1, "base tables and job search index", db.create_tables),
+    (2, "indexes for employer and application lookups", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS jobs_employer_id_idx ON jobs (employer_id)",
+        # Per-job lookups are already served by UNIQUE(job_id, freelancer_id);
+        # this one also returns a job's applications in id order.
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_job_id_idx ON applications (job_id, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_freelancer_id_idx ON applications (freelancer_id)",
+    ]),
+    (3, "trigger-maintained application counts per job", add_application_counts),
+    (4, "job type and salary band filter indexes", [
+        # Band boundaries must match db.SALARY_BANDS. An expression index avoids
+        # rewriting jobs to add a stored column.
+        """
+        CREATE OR REPLACE FUNCTION job_salary_band(salary DOUBLE PRECISION) RETURNS SMALLINT
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT CASE WHEN salary < 1000 THEN 0 WHEN salary < 3000 THEN 1 WHEN salary < 6000 THEN 2 ELSE 3 END::smallint $$
+        """,
+        # Each filter combination reads its page in id order straight off an index
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS jobs_job_type_id_idx ON jobs (job_type, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS jobs_salary_band_id_idx ON jobs (job_salary_band(salary), id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS jobs_job_type_salary_band_id_idx ON jobs (job_type, job_salary_band(salary), id)",
+    ]),
+    (5, "data version stamps for conditional GET", [
+        # One sequence for every scope, so a version never repeats even if a row is removed
+        "CREATE SEQUENCE IF NOT EXISTS data_version_seq",
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope TEXT PRIMARY KEY,
+            version BIGINT NOT NULL
+        )
+        """,
+    ]),
+    (6, "idempotent spooled contact submissions", [
+        # Both columns are nullable without a default, so adding them does not rewrite contacts
+        "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS submission_id UUID",
+        "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS submitted_at TIMESTAMPTZ",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS contacts_submission_id_key ON contacts (submission_id)",
+    ]),
+    (7, "freelancer applications in id order", [
+        # Pages the freelancer status page newest first; replaces the freelancer_id-only index
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_freelancer_id_id_idx ON applications (freelancer_id, id)",
+        "DROP INDEX CONCURRENTLY IF EXISTS applications_freelancer_id_idx",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary key for pg_advisory_lock so two deploys never migrate at once
+MIGRATION_LOCK_ID = 720415
+
+def _connect(timeout: Optional[float] = None):
+    if not db.conn_str:
+        raise ValueError("POSTGRES_URL environment variable is not set")
+    if timeout is None:
+        return connect(db.conn_str, autocommit=True)
+    # libpq takes whole seconds and treats 0 as "wait forever"
+    return connect(db.conn_str, autocommit=True, connect_timeout=max(1, int(timeout)))
+
+def get_schema_version(conn) -> int:
+    """Return the highest applied migration version (0 for a fresh database)"""
+    try:
+        row = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()
+    except UndefinedTable:
+        return 0
+    return row[0]
+
+class SchemaVersionMismatch(RuntimeError):
+    """The database schema is not the version this code was written for"""
+
+def check_schema_version(timeout: Optional[float] = None) -> None:
+    """Raise SchemaVersionMismatch unless the database is exactly at SCHEMA_VERSION.
+    timeout bounds the connect; connection errors propagate as they are"""
+    with _connect(timeout) as conn:
+        version = get_schema_version(conn)
+    if version != SCHEMA_VERSION:
+        raise SchemaVersionMismatch(
+            f"Database schema is at version {version} but this code expects {SCHEMA_VERSION}; "
+            "run `python migrations.py` before starting the app"
+        )
+
+def migrate() -> list:
+    """Apply pending migrations in order and return the versions applied"""
+    applied = []
+    with _connect() as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                """
+            )
+            current = get_schema_version(conn)
+            for version, name, step in MIGRATIONS:
+                if version <= current:
+                    continue
+                print(f"Applying migration {version}: {name}")
+                if callable(step):
+                    step()
+                else:
+                    for statement in step:
+                        conn.execute(statement)
+                conn.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                applied.append(version)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    return applied
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="JobLynk schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "reconcile"])
+    args = parser.parse_args(argv)
+    if args.command == "reconcile":
+        fixed = db.reconcile_application_counts()
+        print(f"Corrected application counts for {fixed} job(s)")
+        return 0
+    if args.command == "status":
+        with _connect() as conn:
+            version = get_schema_version(conn)
+        print(f"Database schema version {version}, code expects {SCHEMA_VERSION}")
+        return 0 if version == SCHEMA_VERSION else 1
+    applied = migrate()
+    print(f"Applied {len(applied)} migration(s); schema is at version {SCHEMA_VERSION}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""Job recommendations for freelancers.
+
+Every job is a hashed term vector (title terms count double, like in search)
+with sublinear term frequencies, normalized to unit length, stored as one row
+of a SciPy CSR matrix. A freelancer's profile is the vector of their recent
+cover letters plus the rows of the jobs they applied to. Scoring is a single
+sparse matrix-vector product against the profile weighted by IDF, followed by
+np.argpartition for the top k, so no Python loop ever runs over the jobs.
+
+IDF is applied on the profile side only. That way, adding a job changes one
+row and the document frequencies, and nothing needs re-normalizing. New and
+edited jobs go into a small delta matrix. Deleted or replaced rows are masked
+out. The delta is merged into the main matrix once it grows past
+RECOMMEND_MERGE_ROWS.
+
+The index is built in a background thread on first use, and recommend_jobs()
+returns [] until the build is done. Writes made through this process's db
+helpers show up immediately. Writes made by other gunicorn workers show up
+after the periodic rebuild (RECOMMEND_REBUILD_SECONDS).
+"""
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import scipy.sparse as sp
+import db
+
+N_FEATURES = 2 ** int(os.getenv("RECOMMEND_HASH_BITS", 18))
+RECOMMEND_MERGE_ROWS = int(os.getenv("RECOMMEND_MERGE_ROWS", 2000))
+RECOMMEND_REBUILD_SECONDS = float(os.getenv("RECOMMEND_REBUILD_SECONDS", 600))
+# How much the cover letters count against the applied-to jobs in a profile
+COVER_LETTER_WEIGHT = 0.5
+TITLE_WEIGHT = 2
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i if in into is it its me my of on or our "
+    "so than that the their them they this to was we were will with you your".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+logger = logging.getLogger(__name__)
+
+
+def _feature(token: str) -> int:
+    # crc32 instead of hash(): it is stable across processes and restarts
+    return zlib.crc32(token.encode()) & (N_FEATURES - 1)
+
+
+def _term_counts(text: str, weight: float, counts: Dict[int, float]) -> None:
+    for token in _TOKEN.findall((text or "").lower()):
+        if len(token) > 1 and token not in STOP_WORDS:
+            feature = _feature(token)
+            counts[feature] = counts.get(feature, 0) + weight
+
+
+def _vectorize(texts: Iterable[tuple]) -> sp.csr_matrix:
+    """CSR rows of unit-length sublinear TF vectors, one per (title, description) pair"""
+    indptr, indices, data = [0], [], []
+    for title, description in texts:
+        counts: Dict[int, float] = {}
+        _term_counts(title, TITLE_WEIGHT, counts)
+        _term_counts(description, 1, counts)
+        indices.extend(counts)
+        data.extend(counts.values())
+        indptr.append(len(indices))
+    matrix = sp.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, N_FEATURES),
+    )
+    np.log1p(matrix.data, out=matrix.data)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.csr_matrix(sp.diags(1 / norms).dot(matrix), dtype=np.float32)
+
+
+class JobIndex:
+    """Job term vectors with incremental updates; not thread-safe on its own"""
+
+    def __init__(self):
+        self.main = sp.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self.main_ids = np.zeros(0, dtype=np.int64)
+        self.delta_rows: List[sp.csr_matrix] = []
+        self.delta_ids: List[int] = []
+        self.delta = self.main
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of: Dict[int, int] = {}
+        self.doc_freq = np.zeros(N_FEATURES, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def load(self, batches: Iterable[List[dict]]) -> None:
+        """Fill an empty index from batches of jobs (id, title, description)"""
+        matrices, ids = [], []
+        for jobs in batches:
+            matrices.append(_vectorize((job["title"], job["description"]) for job in jobs))
+            ids.extend(job["id"] for job in jobs)
+        if matrices:
+            self.main = sp.vstack(matrices, format="csr")
+        self.main_ids = np.asarray(ids, dtype=np.int64)
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.row_of = dict(zip(ids, range(len(ids))))
+        self.doc_freq = np.bincount(self.main.indices, minlength=N_FEATURES).astype(np.int64)
+
+    def upsert(self, job: dict) -> None:
+        self.remove(job["id"])
+        row = _vectorize([(job["title"], job["description"])])
+        self.delta_rows.append(row)
+        self.delta_ids.append(job["id"])
+        self.row_of[job["id"]] = self.main.shape[0] + len(self.delta_ids) - 1
+        self.alive = np.append(self.alive, True)
+        self.doc_freq[row.indices] += 1
+        self.delta = sp.vstack(self.delta_rows, format="csr")
+        if len(self.delta_ids) >= RECOMMEND_MERGE_ROWS:
+            self._merge()
+
+    def remove(self, job_id: int) -> None:
+        row = self.row_of.pop(job_id, None)
+        if row is None:
+            return
+        self.alive[row] = False
+        self.doc_freq[self._row(row).indices] -= 1
+
+    def _row(self, row: int) -> sp.csr_matrix:
+        main_rows = self.main.shape[0]
+        return self.main[row] if row < main_rows else self.delta_rows[row - main_rows]
+
+    def _merge(self) -> None:
+        self.main = sp.vstack([self.main] + self.delta_rows, format="csr")
+        self.main_ids = np.concatenate([self.main_ids, np.asarray(self.delta_ids, dtype=np.int64)])
+        self.delta_rows, self.delta_ids = [], []
+        self.delta = sp.csr_matrix((0, N_FEATURES), dtype=np.float32)
+
+    def idf(self) -> np.ndarray:
+        n = len(self.row_of)
+        return (np.log((1 + n) / (1 + self.doc_freq)) + 1).astype(np.float32)
+
+    def profile(self, cover_letters: List[str], job_ids: List[int]) -> Optional[np.ndarray]:
+        """Dense profile vector, or None when there is nothing to go on"""
+        vector = np.zeros(N_FEATURES, dtype=np.float32)
+        letters = [text for text in cover_letters if text]
+        if letters:
+            vector += COVER_LETTER_WEIGHT * _vectorize([("", " ".join(letters))]).toarray().ravel()
+        rows = [self._row(self.row_of[job_id]) for job_id in job_ids if job_id in self.row_of]
+        if rows:
+            vector += np.asarray(sp.vstack(rows).mean(axis=0)).ravel()
+        return vector if vector.any() else None
+
+    def top_k(self, vector: np.ndarray, k: int, exclude: Iterable[int] = ()) -> List[int]:
+        """Ids of the k best-scoring live jobs, best first"""
+        weights = vector * self.idf()
+        scores = np.concatenate([self.main.dot(weights), self.delta.dot(weights)])
+        scores[~self.alive] = 0
+        for job_id in exclude:
+            row = self.row_of.get(job_id)
+            if row is not None:
+                scores[row] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        main_rows = len(self.main_ids)
+        return [int(self.main_ids[row]) if row < main_rows else self.delta_ids[row - main_rows] for row in candidates]
+
+
+_lock = threading.Lock()
+_index: Optional[JobIndex] = None
+_built_at = 0.0
+_building = False
+_build_thread: Optional[threading.Thread] = None
+# Writes seen while a rebuild is running, replayed onto the new index
+_pending: List[tuple] = []
+
+
+def build_index() -> JobIndex:
+    """Load every job into a fresh index"""
+    index = JobIndex()
+    index.load(db.iter_job_texts())
+    return index
+
+
+def _rebuild() -> None:
+    global _index, _built_at, _building
+    started = time.perf_counter()
+    try:
+        index = build_index()
+    except Exception:
+        logger.exception("building the recommendation index failed")
+        with _lock:
+            _building = False
+            _pending.clear()
+        return
+    with _lock:
+        for job_id, job in _pending:
+            _apply(index, job_id, job)
+        # A bulk import during the build may have landed after its snapshot
+        bulk_write = any(job_id is None for job_id, _ in _pending)
+        _pending.clear()
+        _index, _built_at, _building = index, 0.0 if bulk_write else time.monotonic(), False
+    logger.info("recommendation index: %d jobs in %.1fs", len(index), time.perf_counter() - started)
+
+
+def ensure_index(wait: bool = False) -> Optional[JobIndex]:
+    """Return the current index, starting a background (re)build when missing or stale.
+    wait blocks until that build, or one already running, has finished"""
+    global _building, _build_thread
+    with _lock:
+        stale = _index is None or time.monotonic() - _built_at > RECOMMEND_REBUILD_SECONDS
+        if stale and not _building:
+            _building = True
+            _build_thread = threading.Thread(target=_rebuild, name="recommend-index", daemon=True)
+            _build_thread.start()
+        thread = _build_thread
+    if wait and thread is not None:
+        thread.join()
+    return _index
+
+
+def _apply(index: JobIndex, job_id: Optional[int], job: Optional[dict]) -> None:
+    if job is not None:
+        index.upsert(job)
+    elif job_id is not None:
+        index.remove(job_id)
+
+
+@db.on_job_write
+def _on_job_write(job_id: Optional[int], job: Optional[dict]) -> None:
+    global _built_at
+    with _lock:
+        if _building:
+            _pending.append((job_id, job))
+        if _index is None:
+            return
+        if job_id is None:
+            _built_at = 0.0  # bulk import: rebuild on the next request
+        else:
+            _apply(_index, job_id, job)
+
+
+def index_ready() -> bool:
+    """Whether recommend_jobs() can return anything yet (part of the dashboard ETag)"""
+    return _index is not None
+
+
+def recommend_jobs(freelancer_id: int, k: int = 3) -> List[dict]:
+    """Up to k listing rows recommended for the freelancer, best match first"""
+    index = ensure_index()
+    if index is None:
+        return []
+    applications = db.get_freelancer_profile(freelancer_id)
+    applied = [a["job_id"] for a in applications]
+    with _lock:
+        vector = index.profile([a["cover_letter"] for a in applications], applied)
+        if vector is None:
+            return []
+        job_ids = index.top_k(vector, k, exclude=applied)
+    return db.get_jobs_by_ids(job_ids)
@@ -1,11 +1,33 @@
-from flask import Blueprint, render_template, request, redirect, send_file, url_for, flash
+import hashlib
+import logging
+import os
+from datetime import date
+from flask import (
+    Blueprint, Response, render_template, request, redirect, url_for, flash, get_flashed_messages, jsonify, session,
+    make_response, stream_template, stream_with_context,
+)
+import cache
 import db
+import adb
 import utils
-import os
+import storage
+import importer
+import exporter
+import recommend
+import contact_spool
+import assets
 from functools import wraps
+from typing import Optional
+from psycopg import DataError, Error as DatabaseError
+
+logger = logging.getLogger(__name__)
 
 routes = Blueprint("routes", __name__)
 
+MAX_BATCH_APPLICATIONS = 500
+# Ids are Postgres INTEGER columns
+MAX_ID = 2**31 - 1
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -37,6 +59,55 @@ def role_required(required_role):
         return decorated_function
     return decorator
 
+_page_fingerprint = None
+
+def _pages_fingerprint() -> str:
+    """Hash of the templates and asset manifest, so a deploy that changes markup changes every ETag"""
+    global _page_fingerprint
+    if _page_fingerprint is None:
+        digest = hashlib.sha256(repr(sorted(assets.load_manifest().items())).encode())
+        template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+        for name in sorted(os.listdir(template_dir)):
+            with open(os.path.join(template_dir, name), "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read())
+        _page_fingerprint = digest.hexdigest()
+    return _page_fingerprint
+
+def conditional_get(scopes, extra=None):
+    """Decorator that answers If-None-Match with 304 before the view runs its queries.
+
+    scopes(user_id) lists the data_versions scopes the page is built from; extra()
+    may add other inputs (e.g. in-process state). The ETag covers those versions,
+    the user, the full URL and the deployed templates. Pages with pending flash
+    messages are always rendered, since the flashes are not part of the ETag.
+    Scopes that are also query cache namespaces ("jobs") are passed to
+    cache.observe_version, so the page is never built from entries cached before
+    the versions its ETag names.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_id = utils.get_current_user_id()
+            page_scopes = scopes(user_id)
+            versions = db.get_data_versions(page_scopes)
+            for scope, version in zip(page_scopes, versions):
+                cache.observe_version(scope, version)
+            key = (_pages_fingerprint(), user_id, request.full_path, page_scopes,
+                   versions, extra() if extra else None)
+            etag = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+            if request.if_none_match.contains_weak(etag) and not session.get("_flashes"):
+                response = make_response("", 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
 @routes.route("/")
 def index():
     return render_template("index.html")
@@ -119,22 +190,31 @@ def employers_register():
 
 @routes.route("/employers/dashboard")
 @role_required('employer')
+@conditional_get(lambda user_id: [f"employer:{user_id}"])
 def employers_dashboard():
     user_id = utils.get_current_user_id()
-    jobs = db.get_jobs_by_employer(user_id)
-    user = db.get_user_by_id(user_id)
-    return render_template("employers-dashboard.html", jobs=jobs, user=user)
+    jobs = adb.start(adb.get_jobs_by_employer(user_id))
+    user = utils.get_current_user()
+    return render_template("employers-dashboard.html", jobs=jobs.result(adb.ADB_TIMEOUT), user=user)
 
 @routes.route("/employer/job/applications/<int:job_id>", methods=["GET"])
 @role_required('employer')
 def view_job_applications(job_id):
     user_id = utils.get_current_user_id()
-    job = next((j for j in db.get_jobs_by_employer(user_id) if j["id"] == job_id), None)
-    if not job:
+    status = request.args.get("status")
+    if status not in ["applied", "approved", "rejected"]:
+        status = None
+    result = db.get_applications_for_job(job_id, user_id, status=status, after_id=request.args.get("after", type=int))
+    if not result:
         flash("Job not found or unauthorized!")
         return redirect(url_for("routes.employers_dashboard"))
-    applications = [a for a in db.get_applications_for_employer(user_id) if a["job_id"] == job_id]
-    return render_template("job-applications.html", job=job, applications=applications)
+    return render_template(
+        "job-applications.html",
+        job=result["job"],
+        applications=result["applications"],
+        status_filter=status,
+        next_cursor=result["next_cursor"],
+    )
 
 
 @routes.route("/employer/upload", methods=["GET", "POST"])
@@ -155,11 +235,72 @@ def upload_job():
         flash("Failed to upload job!")
     return render_template("upload-employers.html")
 
+@routes.route("/employer/jobs/import", methods=["POST"])
+@role_required('employer')
+def import_jobs():
+    """Bulk-import a CSV or JSONL file of jobs; JSON clients get the per-row report"""
+    request.max_content_length = importer.MAX_IMPORT_BYTES
+    wants_json = request.accept_mimetypes.best == "application/json"
+    upload = request.files.get("jobs_file")
+    if not upload or not upload.filename:
+        if wants_json:
+            return jsonify({"error": "No file uploaded."}), 400
+        flash("Choose a CSV or JSONL file to import.")
+        return redirect(url_for("routes.upload_job"))
+    try:
+        report = importer.import_upload(upload, utils.get_current_user_id(), request.form.get("format") or None)
+    except (ValueError, UnicodeDecodeError) as e:
+        if wants_json:
+            return jsonify({"error": str(e)}), 400
+        flash(f"Import failed: {e}")
+        return redirect(url_for("routes.upload_job"))
+    except DatabaseError as e:
+        # The COPY is rolled back as a whole, so nothing from the file was imported
+        logger.warning("job import for employer %s failed: %s", utils.get_current_user_id(), e)
+        message = f"the database rejected the file ({e.diag.message_primary or type(e).__name__}); nothing was imported"
+        if wants_json:
+            return jsonify({"error": message}), 400 if isinstance(e, DataError) else 500
+        flash(f"Import failed: {message}")
+        return redirect(url_for("routes.upload_job"))
+    if wants_json:
+        return jsonify(report)
+    flash(f"Imported {report['imported']} job(s).")
+    if report["error_count"]:
+        shown = "; ".join(f"row {e['row']}: {e['error']}" for e in report["errors"][:5])
+        flash(f"{report['error_count']} row(s) skipped ({shown}).")
+    return redirect(url_for("routes.employers_dashboard"))
+
+@routes.route("/employer/applications/export")
+@role_required('employer')
+def export_applications():
+    """Download applicants as CSV or JSONL, for one job (?job_id=) or every job, optionally by ?status="""
+    user_id = utils.get_current_user_id()
+    fmt = request.args.get("format", "csv")
+    job_id = request.args.get("job_id", type=int)
+    statuses = [status for status in request.args.getlist("status") if status in exporter.STATUSES]
+    if fmt not in exporter.FORMATS:
+        flash("Unsupported export format!")
+        return redirect(url_for("routes.employers_dashboard"))
+    if job_id is not None and not db.get_job_for_employer(job_id, user_id):
+        flash("Job not found or unauthorized!")
+        return redirect(url_for("routes.employers_dashboard"))
+    filename = f"applicants-{f'job-{job_id}' if job_id else 'all'}-{date.today().isoformat()}.{fmt}"
+    return Response(
+        stream_with_context(exporter.stream_applicants(fmt, user_id, job_id=job_id, statuses=statuses)),
+        mimetype=exporter.MIMETYPES[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Cache-Control": "no-store",
+            # Let nginx pass rows on as they come instead of buffering the whole file
+            "X-Accel-Buffering": "no",
+        },
+    )
+
 @routes.route("/employer/job/edit/<int:job_id>", methods=["GET", "POST"])
 @role_required('employer')
 def edit_job(job_id):
     user_id = utils.get_current_user_id()
-    job = next((j for j in db.get_jobs_by_employer(user_id) if j["id"] == job_id), None)
+    job = db.get_job_for_employer(job_id, user_id)
     if not job:
         flash("Job not found or unauthorized!")
         return redirect(url_for("routes.employers_dashboard"))
@@ -197,8 +338,8 @@ def update_application_status(application_id):
         flash("Invalid status!")
         return redirect(url_for("routes.employers_dashboard"))
     
-    application = db.get_application_by_id(application_id)
-    if not application or db.get_job_by_id(application["job_id"])["employer_id"] != user_id:
+    application = db.get_application_for_employer(application_id, user_id)
+    if not application:
         flash("Unauthorized or application not found!")
         return redirect(url_for("routes.employers_dashboard"))
     
@@ -209,50 +350,101 @@ def update_application_status(application_id):
     return redirect(url_for("routes.view_job_applications", job_id=application["job_id"]))
 
 
+def _parse_id(value) -> Optional[int]:
+    """A positive database id from a form or JSON value, or None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str) and value.strip().isdecimal():
+        value = int(value)
+    return value if isinstance(value, int) and 0 < value <= MAX_ID else None
+
+
+@routes.route("/employer/applications/status", methods=["POST"])
+@role_required('employer')
+def update_application_statuses():
+    """Approve/reject many applications at once; JSON clients get the per-id outcomes"""
+    user_id = utils.get_current_user_id()
+    wants_json = request.accept_mimetypes.best == "application/json"
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        payload = payload if isinstance(payload, dict) else {}
+        status = payload.get("status")
+        raw_ids = payload.get("application_ids") or []
+    else:
+        status = request.form.get("status")
+        raw_ids = request.form.getlist("application_ids")
+    job_id = request.form.get("job_id", type=int)
+    back = url_for("routes.view_job_applications", job_id=job_id) if job_id else url_for("routes.employers_dashboard")
+
+    application_ids = [_parse_id(i) for i in raw_ids] if isinstance(raw_ids, list) else [None]
+    error = None
+    if status not in ["applied", "approved", "rejected"]:
+        error = "Invalid status!"
+    elif not application_ids:
+        error = "Select at least one application."
+    elif None in application_ids:
+        error = "Invalid application id!"
+    elif len(application_ids) > MAX_BATCH_APPLICATIONS:
+        error = f"Update at most {MAX_BATCH_APPLICATIONS} applications at a time."
+    if error:
+        if wants_json:
+            return jsonify({"error": error}), 400
+        flash(error)
+        return redirect(back)
+
+    outcomes = db.update_application_statuses(application_ids, status, user_id)
+    if wants_json:
+        return jsonify({"status": status, "results": {str(i): outcome for i, outcome in outcomes.items()}})
+    updated = sum(1 for outcome in outcomes.values() if outcome == "updated")
+    flash(f"{updated} application(s) marked {status.capitalize()}.")
+    if updated < len(outcomes):
+        flash(f"{len(outcomes) - updated} application(s) not found or unauthorized.")
+    return redirect(back)
+
+
 @routes.route("/freelancers/dashboard")
 @role_required('freelancer')
+@conditional_get(lambda user_id: ["jobs", f"freelancer:{user_id}"], extra=recommend.index_ready)
 def freelancers_dashboard():
     page = request.args.get("page", 1, type=int)
-    search_query = request.args.get("search", "").lower()
+    search_query = request.args.get("search", "").strip()
     per_page = 3  
 
-    all_jobs = db.get_all_jobs()
-
-    jobs_with_employer = []
-    for job in all_jobs:
-        employer = db.get_user_by_id(job["employer_id"])
-        job["company_name"] = (
-            employer.get("company_name", "Unknown") if employer else "Unknown"
-        )
-        jobs_with_employer.append(job)
+    job_type = request.args.get("job_type", "").strip() or None
+    salary_band = request.args.get("salary") if request.args.get("salary") in db.SALARY_BAND_INDEX else None
+    filters = {"job_type": job_type, "salary_band": salary_band}
 
     if search_query:
-        filtered_jobs = [
-            job
-            for job in jobs_with_employer
-            if search_query in job["title"].lower()
-            or search_query in job["description"].lower()
-        ]
+        result = db.search_jobs(search_query, per_page, cursor=request.args.get("after"), page=page, **filters)
     else:
-        filtered_jobs = jobs_with_employer
-
-    total_jobs = len(filtered_jobs)
-    total_pages = (total_jobs + per_page - 1) // per_page
-    page = max(1, min(page, total_pages))  # Ensure page is within bounds
-
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    jobs = filtered_jobs[start_idx:end_idx]
+        result = db.get_jobs_page(per_page, page=page, after_id=request.args.get("after", type=int), **filters)
+    total_pages = (result["total"] + per_page - 1) // per_page
+    facets = db.get_job_facets(**filters)
+    recommended = []
+    if not search_query and not job_type and not salary_band and result["page"] == 1:
+        recommended = recommend.recommend_jobs(utils.get_current_user_id())
 
     return render_template(
         "freelancers-dashboard.html",
-        jobs=jobs,
+        jobs=result["jobs"],
         total_pages=total_pages,
-        current_page=page,
+        current_page=result["page"],
+        next_cursor=result["next_cursor"],
+        recommended=recommended,
+        facets=facets,
+        job_type=job_type,
+        salary_band=salary_band,
         search_query=search_query,
     )
 
 
+@routes.route("/freelancers/jobs/suggest")
+@role_required('freelancer')
+def suggest_jobs():
+    """Typeahead for the dashboard search box"""
+    return jsonify(db.suggest_jobs(request.args.get("q", "")))
+
+
 @routes.route("/job/apply/<int:job_id>", methods=["GET", "POST"])
 @role_required('freelancer')
 def apply_job(job_id):
@@ -261,22 +453,27 @@ def apply_job(job_id):
         about = request.form.get("about")  
         resume = request.files.get("resume")
         if resume and resume.filename:
-            upload_folder = os.path.join("static", "uploads")
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            filename = f"{user_id}_{resume.filename}"
-            resume_path = os.path.join(upload_folder, filename)
-            resume.save(resume_path)
-            
-            if db.insert_application(job_id, user_id, about, resume_path):
+            try:
+                staged = storage.stage_resume(resume)
+            except storage.ResumeRejected as e:
+                flash(str(e))
+                return redirect(url_for("routes.apply_job", job_id=job_id))
+            try:
+                applied = db.insert_application(job_id, user_id, about, staged.path, before_commit=staged.publish)
+            except OSError:
+                flash("Could not save your resume. Please try again.")
+                return redirect(url_for("routes.apply_job", job_id=job_id))
+            finally:
+                staged.discard()
+            if applied:
                 flash("Application submitted successfully!")
                 return redirect(url_for("routes.freelancers_dashboard"))
             flash("You have already applied for this job!")
         else:
             flash("Please upload a resume!")
-    job = next((j for j in db.get_all_jobs() if j["id"] == job_id), None)
-    user = db.get_user_by_id(user_id) 
-    return render_template("apply-freelancers.html", job_id=job_id, job=job, user=user)
+    job = adb.start(adb.get_job_by_id(job_id))
+    user = utils.get_current_user()
+    return render_template("apply-freelancers.html", job_id=job_id, job=job.result(adb.ADB_TIMEOUT), user=user)
 
 
 @routes.route("/download_resume/<int:application_id>")
@@ -285,54 +482,48 @@ def download_resume(application_id):
     """Download resume for a specific application - deployment ready"""
     user_id = utils.get_current_user_id()
     
-    # Get the application and verify the employer owns the job
-    application = db.get_application_by_id(application_id)
+    # One lookup that also verifies the employer owns the job
+    application = db.get_application_for_employer(application_id, user_id)
     if not application:
-        flash("Application not found!")
-        return redirect(url_for("routes.employers_dashboard"))
-    
-    # Check if the current employer owns the job this application is for
-    job = db.get_job_by_id(application["job_id"])
-    if not job or job["employer_id"] != user_id:
-        flash("Unauthorized access!")
+        flash("Application not found or unauthorized!")
         return redirect(url_for("routes.employers_dashboard"))
     
-    # Check if resume exists - works both locally and in production
     resume_path = application["resume_path"]
     if not resume_path:
         flash("No resume uploaded for this application!")
         return redirect(url_for("routes.view_job_applications", job_id=application["job_id"]))
     
-    if not os.path.isabs(resume_path):
-        resume_path = os.path.join(os.getcwd(), resume_path)
-    
-    if not os.path.exists(resume_path):
-        flash("Resume file not found on server!")
-        return redirect(url_for("routes.view_job_applications", job_id=application["job_id"]))
-    
     try:
-        filename = os.path.basename(resume_path)
-        if "_" in filename:
-            original_filename = "_".join(filename.split("_")[1:])
-        else:
-            original_filename = filename
-            
-        return send_file(
-            resume_path,
-            as_attachment=True,
-            download_name=f"{application['freelancer_name']}_resume_{original_filename}",
-            mimetype='application/octet-stream'
-        )
-    except Exception as e:
-        flash("Error downloading resume!")
+        return storage.send_resume(resume_path, storage.download_name(resume_path, application["freelancer_name"]))
+    except FileNotFoundError:
+        flash("Resume file not found on server!")
         return redirect(url_for("routes.view_job_applications", job_id=application["job_id"]))
     
 @routes.route("/freelancers/status")
 @role_required('freelancer')
+@conditional_get(lambda user_id: ["jobs", f"freelancer:{user_id}"])
 def freelancer_status():
     user_id = utils.get_current_user_id()
-    applications = db.get_applications_for_freelancer(user_id)
-    return render_template("freelancer-status.html", applications=applications)    
+    status = request.args.get("status")
+    if status not in ["applied", "approved", "rejected"]:
+        status = None
+    # The query runs after the 200 has gone out, so a bad cursor must be dropped here
+    before = _parse_id(request.args.get("before"))
+    # Cover letters and job descriptions are only loaded for the application being viewed
+    open_id = _parse_id(request.args.get("open"))
+    opened = db.get_freelancer_application(open_id, user_id) if open_id else None
+    applications = db.get_applications_for_freelancer(user_id, status=status, before_id=before)
+    # Streamed, so the page head goes out before the applications are fetched. The
+    # session cookie is sent with the headers, so flashes must be consumed here:
+    # reading them from the streamed body would never clear them.
+    return stream_template(
+        "freelancer-status.html",
+        applications=applications,
+        status_filter=status,
+        before=before,
+        opened=opened,
+        messages=get_flashed_messages(),
+    )
 
 
 @routes.route("/contact", methods=['POST'])
@@ -343,9 +534,20 @@ def contact():
     if not name or not email or not message:
         flash("All fields are required!")
         return redirect(url_for("routes.index") + "#contact")
-    
+    if any(db.UNSTORABLE_TEXT.search(value) for value in (name, email, message)):
+        flash("Your message contains characters we cannot accept. Please remove them and try again.")
+        return redirect(url_for("routes.index") + "#contact")
 
-    if db.insert_contact(name, email, message):
+    try:
+        contact_spool.submit(name, email, message)
+        stored = True
+    except contact_spool.SpoolFull:
+        flash("We are receiving a lot of messages right now. Please try again in a few minutes.")
+        return redirect(url_for("routes.index") + "#contact")
+    except OSError:
+        # The spool disk is unavailable; write straight to the database instead
+        stored = db.insert_contact(name, email, message) is not None
+    if stored:
         flash("Thank you for contacting us! We will get back to you soon.")
     else:
         flash("Error submitting your message. Please try again later.")
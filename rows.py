@@ -0,0 +1,160 @@
+"""Typed result rows for the hot queries in db.py and adb.py.
+
+Each class is a slotted dataclass whose fields match one query's columns in
+order. typed_row() builds rows from each result tuple positionally, so no
+per-row dict is created, and a row takes about a third of a dict's memory.
+Rows also behave like read-only mappings (row["title"], row.get(), keys(),
+dict(row)), so templates and code written against dict rows keep working.
+The query cache shares rows between requests, so treat them as read-only.
+
+The dataclasses are not frozen: a frozen dataclass sets each field through
+object.__setattr__, which makes building a row about four times slower.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional, Sequence, Tuple
+from psycopg import ProgrammingError
+
+
+class Row:
+    """Read-only mapping interface for slotted dataclass rows"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def values(self) -> Iterator[Any]:
+        return (getattr(self, key) for key in self.__slots__)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((key, getattr(self, key)) for key in self.__slots__)
+
+
+def typed_row(row_type: type) -> Callable:
+    """psycopg row factory that builds row_type from each row's values by position.
+    The column names are checked against the fields once per result"""
+    def make_factory(cursor) -> Callable[[Sequence[Any]], Any]:
+        if cursor.description is not None:
+            names = tuple(column.name for column in cursor.description)
+            if names != row_type.__slots__:
+                raise ProgrammingError(f"{row_type.__name__} expects columns {row_type.__slots__}, got {names}")
+        return lambda values: row_type(*values)
+
+    return make_factory
+
+
+@dataclass(slots=True)
+class User(Row):
+    id: int
+    name: str
+    email: str
+    password: str
+    role: str
+    company_name: Optional[str]
+    date_of_birth: Optional[datetime.date]
+
+
+@dataclass(slots=True)
+class Job(Row):
+    id: int
+    title: str
+    description: str
+    salary: float
+    job_type: str
+    employer_id: int
+
+
+@dataclass(slots=True)
+class JobListing(Row):
+    """A job with its employer's company name, as shown in listings"""
+
+    id: int
+    title: str
+    description: str
+    salary: float
+    job_type: str
+    employer_id: int
+    company_name: str
+
+
+@dataclass(slots=True)
+class SearchResult(Row):
+    id: int
+    title: str
+    description: str
+    salary: float
+    job_type: str
+    employer_id: int
+    company_name: str
+    rank: float
+
+
+@dataclass(slots=True)
+class EmployerJob(Row):
+    """A job on its employer's dashboard, with applicant counts per status"""
+
+    id: int
+    title: str
+    description: str
+    salary: float
+    job_type: str
+    applied_count: int
+    approved_count: int
+    rejected_count: int
+
+
+@dataclass(slots=True)
+class Application(Row):
+    """An application as the employer sees it"""
+
+    id: int
+    job_id: int
+    freelancer_id: int
+    cover_letter: str
+    resume_path: str
+    status: str
+    freelancer_name: str
+    freelancer_email: str
+    job_title: str
+
+
+@dataclass(slots=True)
+class FreelancerApplication(Row):
+    """An application with the job it was for, as the freelancer sees it"""
+
+    id: int
+    job_id: int
+    freelancer_id: int
+    cover_letter: str
+    resume_path: str
+    status: str
+    job_title: str
+    description: str
+    salary: float
+    job_type: str
+    company_name: Optional[str]
+
+
+@dataclass(slots=True)
+class FreelancerApplicationSummary(Row):
+    """An application in the freelancer's history listing, without the large text columns"""
+
+    id: int
+    job_id: int
+    status: str
+    job_title: str
+    salary: float
+    job_type: str
+    company_name: Optional[str]
@@ -0,0 +1,254 @@
+"""Resume storage.
+
+Uploads are streamed in chunks to a temp file while being hashed and sniffed,
+then published under a content-addressed name (<RESUME_DIR>/ab/abcd....pdf), so
+re-uploading the same CV never writes a second copy. The file is only moved into
+place right before the application row commits (see db.insert_application), and
+`python storage.py reap` removes files no application points at.
+"""
+import argparse
+import hashlib
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Optional
+from flask import send_file
+if __name__ == "__main__":
+    # Run as a script: load .env before db reads its settings at import
+    from dotenv import load_dotenv
+    load_dotenv()
+import db
+
+RESUME_DIR = os.getenv("RESUME_DIR", os.path.join("uploads", "resumes"))
+# How downloads leave the app: "send_file" streams through the worker, while
+# "x-accel-redirect" (nginx) and "x-sendfile" (Apache, lighttpd) only authorize
+# the request and let the front proxy send the file.
+RESUME_DOWNLOAD_MODE = os.getenv("RESUME_DOWNLOAD_MODE", "send_file").lower()
+# nginx `internal` location that maps onto RESUME_DIR, e.g.
+#   location /protected-resumes/ { internal; alias /srv/joblynk/uploads/resumes/; }
+RESUME_ACCEL_PREFIX = os.getenv("RESUME_ACCEL_PREFIX", "/protected-resumes/")
+MAX_RESUME_BYTES = int(os.getenv("MAX_RESUME_BYTES", 5 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+TEMP_DIR_NAME = "tmp"
+
+# Magic bytes of the document types we accept, mapped to the stored extension.
+# DOCX and ODT are both ZIP containers, so the client's extension picks between them.
+_SIGNATURES = [
+    (b"%PDF-", ".pdf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".doc"),
+    (b"{\\rtf", ".rtf"),
+    (b"PK\x03\x04", ".docx"),
+]
+# ZIP uploads must also contain the part that makes them a document of that type
+_ZIP_EXTENSIONS = {".docx": "word/document.xml", ".odt": "content.xml"}
+
+
+class ResumeRejected(ValueError):
+    """The upload is too large or not an accepted document type"""
+
+
+def _sniff_extension(head: bytes, filename: str) -> str:
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            if extension == ".docx":
+                declared = os.path.splitext(filename or "")[1].lower()
+                return declared if declared in _ZIP_EXTENSIONS else extension
+            return extension
+    raise ResumeRejected("Resume must be a PDF, Word, ODT or RTF document.")
+
+
+def _check_zip_document(path: str, extension: str) -> None:
+    try:
+        with zipfile.ZipFile(path) as archive:
+            archive.getinfo(_ZIP_EXTENSIONS[extension])
+    except (zipfile.BadZipFile, KeyError):
+        raise ResumeRejected("Resume must be a PDF, Word, ODT or RTF document.") from None
+
+
+class StagedResume:
+    """An upload that has been written to a temp file but not published yet"""
+
+    def __init__(self, temp_path: str, digest: str, extension: str, size: int):
+        self.temp_path = temp_path
+        self.digest = digest
+        self.size = size
+        self.path = os.path.join(RESUME_DIR, digest[:2], digest + extension)
+
+    def publish(self) -> None:
+        """Move the upload to its content-addressed path (a no-op for a duplicate)"""
+        if self.temp_path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            # Bump the mtime so the reaper's grace period covers the new reference
+            os.utime(self.path)
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            # New content, or the reaper took the old copy away just now
+            os.replace(self.temp_path, self.path)
+        self.temp_path = None
+
+    def discard(self) -> None:
+        """Delete the temp file if the upload was never published"""
+        if self.temp_path is not None:
+            try:
+                os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
+            self.temp_path = None
+
+
+def stage_resume(upload) -> StagedResume:
+    """Stream a werkzeug FileStorage to a temp file, hashing and size-checking it as it goes"""
+    temp_dir = os.path.join(RESUME_DIR, TEMP_DIR_NAME)
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = upload.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if extension is None:
+                    extension = _sniff_extension(chunk, upload.filename)
+                size += len(chunk)
+                if size > MAX_RESUME_BYTES:
+                    raise ResumeRejected(f"Resume must be smaller than {MAX_RESUME_BYTES // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        if extension is None:
+            raise ResumeRejected("The uploaded resume is empty.")
+        if extension in _ZIP_EXTENSIONS:
+            _check_zip_document(temp_path, extension)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return StagedResume(temp_path, digest.hexdigest(), extension, size)
+
+
+def _content_digest(resume_path: str) -> Optional[str]:
+    stem = os.path.splitext(os.path.basename(resume_path))[0]
+    return stem if re.fullmatch(r"[0-9a-f]{64}", stem) else None
+
+
+def _proxy_response(download_name: str, header: str, target: str):
+    # Empty body; the proxy replaces it with the file and sets its own length and ranges
+    response = send_file(io.BytesIO(), as_attachment=True, download_name=download_name, mimetype="application/octet-stream")
+    del response.headers["Content-Length"]
+    del response.headers["Accept-Ranges"]
+    response.headers[header] = target
+    return response
+
+
+def send_resume(resume_path: str, download_name: str):
+    """Build the download response for a stored resume.
+
+    In the proxy modes Flask only sets headers and the proxy streams the file.
+    The send_file fallback answers If-None-Match/If-Modified-Since with 304 and
+    serves Range requests, and content-addressed files use their hash as ETag.
+    Raises FileNotFoundError when the fallback cannot find the file.
+    """
+    relative = os.path.relpath(resume_path, RESUME_DIR)
+    in_resume_dir = not relative.startswith(os.pardir)
+    if RESUME_DOWNLOAD_MODE == "x-accel-redirect" and in_resume_dir:
+        return _proxy_response(download_name, "X-Accel-Redirect", RESUME_ACCEL_PREFIX + relative.replace(os.sep, "/"))
+    if RESUME_DOWNLOAD_MODE == "x-sendfile":
+        return _proxy_response(download_name, "X-Sendfile", os.path.abspath(resume_path))
+    absolute_path = os.path.abspath(resume_path)
+    if not os.path.isfile(absolute_path):
+        raise FileNotFoundError(resume_path)
+    digest = _content_digest(resume_path)
+    response = send_file(
+        absolute_path,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype="application/octet-stream",
+        conditional=True,
+        etag=digest if digest else True,
+        max_age=0,
+    )
+    response.cache_control.private = True
+    return response
+
+
+def download_name(resume_path: str, freelancer_name: str) -> str:
+    """Name offered to the employer when downloading a resume"""
+    filename = os.path.basename(resume_path)
+    if _content_digest(resume_path):
+        return f"{freelancer_name}_resume{os.path.splitext(filename)[1]}"
+    # Uploads stored before content addressing are named <user_id>_<original name>
+    original_filename = "_".join(filename.split("_")[1:]) if "_" in filename else filename
+    return f"{freelancer_name}_resume_{original_filename}"
+
+
+def _remove_if_stale(path: str, cutoff: float) -> bool:
+    """Delete path unless its mtime moved past cutoff since it was listed.
+
+    StagedResume.publish bumps the mtime of a duplicate upload before its
+    application commits. Renaming the file away first means a publish either
+    bumped it before the rename (the file is put back) or finds it gone and
+    writes its own copy, so a referenced resume is never deleted.
+    """
+    reaping = path + ".reaping"
+    try:
+        os.rename(path, reaping)
+    except FileNotFoundError:
+        return False
+    if os.stat(reaping).st_mtime >= cutoff:
+        # Published again meanwhile; any copy publish wrote since has the same content
+        os.replace(reaping, path)
+        return False
+    os.remove(reaping)
+    return True
+
+
+def reap_orphans(grace_seconds: int = 3600) -> dict:
+    """Delete stale temp files and stored resumes that no application references.
+
+    Files younger than grace_seconds are left alone so uploads whose application
+    is still being committed are never removed, and each file's age is checked
+    again as it is removed (see _remove_if_stale).
+    """
+    cutoff = time.time() - grace_seconds
+    removed = {"temp": 0, "orphaned": 0}
+    if not os.path.isdir(RESUME_DIR):
+        return removed
+    for entry in os.scandir(RESUME_DIR):
+        if not entry.is_dir():
+            continue
+        candidates = [f.path for f in os.scandir(entry.path) if f.is_file() and f.stat().st_mtime < cutoff]
+        if entry.name == TEMP_DIR_NAME:
+            stale = candidates
+            kind = "temp"
+        else:
+            referenced = db.get_referenced_resume_paths(candidates) if candidates else set()
+            stale = [path for path in candidates if path not in referenced]
+            kind = "orphaned"
+        for path in stale:
+            if _remove_if_stale(path, cutoff):
+                removed[kind] += 1
+    return removed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="JobLynk resume storage maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    reap = subcommands.add_parser("reap", help="delete temp files and unreferenced resumes")
+    reap.add_argument("--grace", type=int, default=3600, help="minimum file age in seconds (default 3600)")
+    args = parser.parse_args(argv)
+    removed = reap_orphans(args.grace)
+    print(f"Removed {removed['temp']} temp file(s) and {removed['orphaned']} orphaned resume(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""Shared fixtures. The tests replace db helpers with stubs, so no database is needed"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+import utils  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app = app_module.create_app()
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(app, client):
+    """login(user_id, role) gives the test client a signed auth cookie"""
+    def set_auth_cookie(user_id, role):
+        with app.test_request_context():
+            token = utils._auth_serializer().dumps({"user_id": user_id, "role": role})
+        client.set_cookie(utils.AUTH_COOKIE, token)
+    return set_auth_cookie
@@ -0,0 +1,67 @@
+import pytest
+from psycopg import errors
+
+import db
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    """Calls to update_application_statuses; every requested id is reported updated"""
+    calls = []
+
+    def update_application_statuses(application_ids, status, employer_id):
+        calls.append((application_ids, status, employer_id))
+        return {i: "updated" for i in application_ids}
+
+    monkeypatch.setattr(db, "update_application_statuses", update_application_statuses)
+    return calls
+
+
+def post_json(client, payload):
+    return client.post("/employer/applications/status", json=payload, headers={"Accept": "application/json"})
+
+
+def test_updates_valid_ids(client, login, updates):
+    login(7, "employer")
+    response = post_json(client, {"status": "approved", "application_ids": [3, "4"]})
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "approved", "results": {"3": "updated", "4": "updated"}}
+    assert updates == [([3, 4], "approved", 7)]
+
+
+@pytest.mark.parametrize("ids", [[2**31], [0], [-1], ["x"], [True], [1.5], "12"])
+def test_rejects_bad_ids_with_400(client, login, updates, ids):
+    login(7, "employer")
+    response = post_json(client, {"status": "approved", "application_ids": ids})
+    assert response.status_code == 400
+    assert updates == []
+
+
+def test_rejects_bad_form_ids(client, login, updates):
+    login(7, "employer")
+    response = client.post(
+        "/employer/applications/status", data={"status": "rejected", "application_ids": ["5", "99999999999"], "job_id": "2"},
+    )
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/employer/job/applications/2")
+    assert updates == []
+    with client.session_transaction() as session:
+        assert ("message", "Invalid application id!") in session["_flashes"]
+
+
+def test_rejects_oversized_batches(client, login, updates):
+    login(7, "employer")
+    response = post_json(client, {"status": "approved", "application_ids": list(range(1, 502))})
+    assert response.status_code == 400
+    assert updates == []
+
+
+def test_database_errors_propagate(app, client, login, monkeypatch):
+    def update_application_statuses(application_ids, status, employer_id):
+        raise errors.AdminShutdown("terminating connection")
+
+    monkeypatch.setattr(db, "update_application_statuses", update_application_statuses)
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    login(7, "employer")
+    response = post_json(client, {"status": "approved", "application_ids": [3]})
+    assert response.status_code == 500
@@ -0,0 +1,89 @@
+import pytest
+
+import cache
+import db
+from routes import conditional_get
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    """Stubbed data_versions table: scope -> version"""
+    table = {}
+    monkeypatch.setattr(db, "get_data_versions", lambda scopes: tuple(table.get(scope, 0) for scope in scopes))
+    return table
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache, "_versions", {})
+    monkeypatch.setattr(cache, "_generations", {})
+    cache.configure_shared(None)
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def listing(app, versions, fresh_cache):
+    """A page built from a "jobs"-cached helper, like the freelancer dashboard.
+    Writes to `rows` stand in for another worker's write, so this worker's cache is not invalidated"""
+    rows = {"title": "old"}
+    calls = []
+
+    @cache.cached("jobs")
+    def get_title():
+        return rows["title"]
+
+    @conditional_get(lambda user_id: ["jobs"])
+    def page():
+        calls.append(1)
+        return get_title()
+
+    app.add_url_rule("/test/listing", "test_listing", page)
+    return rows, calls
+
+
+def test_revalidation_gets_304_without_running_the_view(client, versions, listing):
+    rows, calls = listing
+    versions["jobs"] = 1
+    first = client.get("/test/listing")
+    assert first.status_code == 200
+    second = client.get("/test/listing", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    assert len(calls) == 1
+
+
+def test_new_version_is_never_paired_with_a_stale_cached_page(client, versions, listing):
+    rows, calls = listing
+    versions["jobs"] = 1
+    first = client.get("/test/listing")
+    assert first.get_data(as_text=True) == "old"
+
+    # Another worker writes and bumps the version; its invalidation never reaches this worker
+    rows["title"] = "new"
+    versions["jobs"] = 2
+    second = client.get("/test/listing", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.get_data(as_text=True) == "new"
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert client.get("/test/listing", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
+
+
+def test_older_version_from_a_lagging_replica_keeps_the_newer_one(fresh_cache):
+    @cache.cached("jobs")
+    def value():
+        return object()
+
+    cache.observe_version("jobs", 5)
+    cached = value()
+    cache.observe_version("jobs", 4)
+    assert value() is cached
+
+
+def test_pending_flash_is_rendered_not_304(client, versions, listing):
+    rows, calls = listing
+    first = client.get("/test/listing")
+    with client.session_transaction() as session:
+        session["_flashes"] = [("message", "Saved!")]
+    response = client.get("/test/listing", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+from psycopg import DataError
+
+import contact_spool
+import db
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    """An empty spool directory and a stub insert_contacts that rejects NUL like Postgres"""
+    monkeypatch.setattr(contact_spool, "CONTACT_SPOOL_DIR", str(tmp_path))
+    for name in ("tmp", "ready", "claimed", "bad"):
+        os.makedirs(tmp_path / name, exist_ok=True)
+    os.makedirs(contact_spool._claim_dir(os.getpid()), exist_ok=True)
+    stored = []
+
+    def insert_contacts(rows):
+        if any("\x00" in row["message"] for row in rows):
+            raise DataError("PostgreSQL text fields cannot contain NUL (0x00) bytes")
+        stored.extend(rows)
+        return len(rows)
+
+    monkeypatch.setattr(db, "insert_contacts", insert_contacts)
+    return tmp_path, stored
+
+
+def spooled(directory, number, message):
+    record = {"submission_id": f"id-{number}", "name": "A", "email": "a@example.com", "message": message}
+    with open(directory / "ready" / f"{number:020d}-id-{number}.json", "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+
+def test_rejected_message_is_set_aside_and_rest_are_stored(spool):
+    directory, stored = spool
+    spooled(directory, 1, "hello")
+    spooled(directory, 2, "bad\x00byte")
+    spooled(directory, 3, "world")
+    assert contact_spool.flush_once() == 3
+    assert [row["message"] for row in stored] == ["hello", "world"]
+    assert os.listdir(directory / "ready") == []
+    assert os.listdir(directory / "bad") == [f"{2:020d}-id-2.json.bad"]
+    assert contact_spool.flush_once() == 0
+
+
+def test_submit_refuses_unstorable_text(spool):
+    with pytest.raises(ValueError):
+        contact_spool.submit("A", "a@example.com", "bad\x00byte")
+    directory, _ = spool
+    assert os.listdir(directory / "ready") == []
+
+
+def test_contact_form_rejects_nul(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(contact_spool, "submit", lambda *args: submitted.append(args))
+    response = client.post("/contact", data={"name": "A", "email": "a@example.com", "message": "bad\x00byte"})
+    assert response.status_code == 302
+    assert submitted == []
+    with client.session_transaction() as session:
+        assert "cannot accept" in session["_flashes"][0][1]
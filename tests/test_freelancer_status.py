@@ -0,0 +1,93 @@
+import pytest
+
+import db
+from rows import FreelancerApplication, FreelancerApplicationSummary
+
+
+def summary(application_id, status="applied"):
+    return FreelancerApplicationSummary(application_id, 100 + application_id, status, f"Job {application_id}", 1500.0, "Contract", "Acme")
+
+
+@pytest.fixture
+def applications(monkeypatch):
+    """Stubbed status page queries for freelancer 5, who applied to ids 1..25"""
+    stored = [summary(i, "approved" if i % 5 == 0 else "applied") for i in range(25, 0, -1)]
+    calls = []
+
+    def rows(status, before_id, limit):
+        calls.append((status, before_id, limit))
+        for row in stored:
+            if (status is None or row.status == status) and (before_id is None or row.id < before_id):
+                limit -= 1
+                if limit < 0:
+                    return
+                yield row
+
+    def get_applications_for_freelancer(freelancer_id, status=None, before_id=None, limit=20):
+        assert freelancer_id == 5
+        return db.KeysetPage(rows(status, before_id, limit + 1), limit)
+
+    def get_freelancer_application(application_id, freelancer_id):
+        if freelancer_id != 5 or application_id > 25:
+            return None
+        return FreelancerApplication(
+            application_id, 100 + application_id, 5, "My cover letter", "r.pdf", "applied",
+            f"Job {application_id}", "Full description", 1500.0, "Contract", "Acme",
+        )
+
+    monkeypatch.setattr(db, "get_data_versions", lambda scopes: tuple(1 for _ in scopes))
+    monkeypatch.setattr(db, "get_applications_for_freelancer", get_applications_for_freelancer)
+    monkeypatch.setattr(db, "get_freelancer_application", get_freelancer_application)
+    return calls
+
+
+@pytest.fixture
+def freelancer(login):
+    login(5, "freelancer")
+
+
+def test_pages_newest_first(client, freelancer, applications):
+    first = client.get("/freelancers/status")
+    assert first.is_streamed
+    html = first.get_data(as_text=True)
+    assert html.count("Details</a>") == 20
+    assert "before=6" in html
+    second = client.get("/freelancers/status?before=6").get_data(as_text=True)
+    assert second.count("Details</a>") == 5
+    assert "Older</a>" not in second
+    assert applications == [(None, None, 21), (None, 6, 21)]
+
+
+def test_status_filter(client, freelancer, applications):
+    html = client.get("/freelancers/status?status=approved").get_data(as_text=True)
+    assert html.count("Details</a>") == 5
+    assert applications == [("approved", None, 21)]
+
+
+def test_open_loads_details_only_for_own_application(client, freelancer, applications):
+    assert "My cover letter" in client.get("/freelancers/status?open=3").get_data(as_text=True)
+    assert "My cover letter" not in client.get("/freelancers/status?open=99").get_data(as_text=True)
+    assert "My cover letter" not in client.get("/freelancers/status").get_data(as_text=True)
+
+
+def test_flash_is_shown_once_then_cleared(client, freelancer, applications):
+    with client.session_transaction() as session:
+        session["_flashes"] = [("message", "Application submitted successfully!")]
+    first = client.get("/freelancers/status")
+    assert "Application submitted successfully!" in first.get_data(as_text=True)
+    with client.session_transaction() as session:
+        assert not session.get("_flashes")
+    second = client.get("/freelancers/status", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+
+
+@pytest.mark.parametrize("before", ["3000000000", "-5", "0", "abc"])
+def test_out_of_range_cursor_shows_first_page(client, freelancer, applications, before):
+    html = client.get(f"/freelancers/status?before={before}").get_data(as_text=True)
+    assert html.count("Details</a>") == 20
+    assert applications == [(None, None, 21)]
+
+
+def test_out_of_range_open_id_shows_no_details(client, freelancer, applications):
+    html = client.get("/freelancers/status?open=3000000000").get_data(as_text=True)
+    assert "My cover letter" not in html
@@ -0,0 +1,84 @@
+import io
+
+import pytest
+from psycopg import errors
+
+import db
+import importer
+
+
+@pytest.fixture
+def copied(monkeypatch):
+    """Rows bulk_insert_jobs was given, instead of COPYing them"""
+    rows = []
+
+    def bulk_insert_jobs(valid_rows, employer_id):
+        rows.extend(valid_rows)
+        return len(rows)
+
+    monkeypatch.setattr(db, "bulk_insert_jobs", bulk_insert_jobs)
+    return rows
+
+
+@pytest.mark.parametrize("title", ["Nul\x00byte", "Lone \ud800 surrogate"])
+def test_validate_row_rejects_text_postgres_cannot_store(title):
+    values, error = importer.validate_row({"title": title, "description": "d", "salary": "100", "job_type": "Contract"})
+    assert values is None
+    assert error.startswith("title contains characters")
+
+
+def test_import_jobs_skips_and_reports_bad_rows(copied):
+    text = io.StringIO(
+        "title,description,salary,job_type\n"
+        "Good,Work,1200,Contract\n"
+        "Bad,Nul \x00 here,1200,Contract\n"
+        "Cheap,Work,-5,Contract\n"
+    )
+    report = importer.import_jobs(text, "csv", employer_id=7)
+    assert copied == [("Good", "Work", 1200.0, "Contract")]
+    assert report["imported"] == 1
+    assert [e["row"] for e in report["errors"]] == [3, 4]
+
+
+def test_import_jobs_reads_jsonl_surrogate_escapes_as_errors(copied):
+    text = io.StringIO('{"title": "A", "description": "\\ud800", "salary": 10, "job_type": "Contract"}\n')
+    report = importer.import_jobs(text, "jsonl", employer_id=7)
+    assert copied == []
+    assert report["error_count"] == 1
+
+
+def _upload(client, accept="application/json"):
+    data = {"jobs_file": (io.BytesIO(b"title,description,salary,job_type\nA,B,10,Contract\n"), "jobs.csv")}
+    return client.post("/employer/jobs/import", data=data, headers={"Accept": accept}, content_type="multipart/form-data")
+
+
+def test_import_route_reports_database_rejection(client, login, monkeypatch):
+    def bulk_insert_jobs(rows, employer_id):
+        list(rows)
+        raise errors.CharacterNotInRepertoire("invalid byte sequence for encoding \"UTF8\"")
+
+    monkeypatch.setattr(db, "bulk_insert_jobs", bulk_insert_jobs)
+    login(7, "employer")
+    response = _upload(client)
+    assert response.status_code == 400
+    assert "nothing was imported" in response.get_json()["error"]
+
+
+def test_import_route_flashes_database_failure_for_browsers(client, login, monkeypatch):
+    def bulk_insert_jobs(rows, employer_id):
+        raise errors.AdminShutdown("terminating connection")
+
+    monkeypatch.setattr(db, "bulk_insert_jobs", bulk_insert_jobs)
+    login(7, "employer")
+    response = _upload(client, accept="text/html")
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/employer/upload")
+    with client.session_transaction() as session:
+        assert any("Import failed" in message for _, message in session["_flashes"])
+
+
+def test_import_route_reports_rows(client, login, copied):
+    login(7, "employer")
+    response = _upload(client)
+    assert response.status_code == 200
+    assert response.get_json() == {"imported": 1, "error_count": 0, "errors": []}
@@ -0,0 +1,65 @@
+import re
+
+import pytest
+from flask import Flask, stream_with_context
+
+import metrics
+
+
+@pytest.fixture
+def metrics_app(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    monkeypatch.setattr(metrics, "METRICS_PUBLIC", False)
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route("/test/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    @app.route("/test/stream")
+    def stream():
+        def rows():
+            yield "head\n"
+            # A query run while the body streams, after after_request
+            metrics.record_query("SELECT 1", None, 0.001)
+            yield "row\n"
+        return stream_with_context(rows())
+
+    return app
+
+
+def sample(name, **labels):
+    """Value of one sample in the /metrics text, or 0"""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}\{{{re.escape(label_text)}\}} (\S+)$", metrics.render(), re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+def test_unhandled_errors_are_recorded_as_500(metrics_app):
+    before = sample("joblynk_http_request_duration_seconds_count", method="GET", route="/test/boom", status="500")
+    response = metrics_app.test_client().get("/test/boom")
+    assert response.status_code == 500
+    # Like a WSGI server, close the response; that is when the request is recorded
+    response.close()
+    after = sample("joblynk_http_request_duration_seconds_count", method="GET", route="/test/boom", status="500")
+    assert after == before + 1
+
+
+def test_streamed_queries_are_counted(metrics_app):
+    before = sample("joblynk_request_db_queries_sum", route="/test/stream")
+    response = metrics_app.test_client().get("/test/stream")
+    assert response.get_data(as_text=True) == "head\nrow\n"
+    response.close()
+    assert sample("joblynk_request_db_queries_sum", route="/test/stream") == before + 1
+
+
+def test_metrics_closed_without_token(metrics_app, monkeypatch):
+    client = metrics_app.test_client()
+    assert client.get("/metrics").status_code == 404
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    monkeypatch.setattr(metrics, "METRICS_PUBLIC", True)
+    assert client.get("/metrics").status_code == 200
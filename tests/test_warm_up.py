@@ -0,0 +1,57 @@
+import pytest
+from psycopg import OperationalError
+
+import app as app_module
+import contact_spool
+import db
+import migrations
+
+
+@pytest.fixture(autouse=True)
+def cold_process(monkeypatch):
+    monkeypatch.setattr(app_module, "_warmed_pid", None)
+    monkeypatch.setattr(contact_spool, "start", lambda: None)
+
+
+def test_schema_mismatch_stops_the_process(monkeypatch):
+    def check_schema_version(timeout):
+        raise migrations.SchemaVersionMismatch("Database schema is at version 6 but this code expects 7")
+
+    monkeypatch.setattr(app_module, "check_schema_version", check_schema_version)
+    with pytest.raises(migrations.SchemaVersionMismatch):
+        app_module.warm_up()
+
+
+def test_unreachable_database_starts_cold(monkeypatch):
+    def check_schema_version(timeout):
+        raise OperationalError("connection refused")
+
+    monkeypatch.setattr(app_module, "check_schema_version", check_schema_version)
+    assert app_module.warm_up() is False
+    assert app_module._warmed_pid is None
+
+
+def test_warm_up_runs_once_per_process(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "check_schema_version", lambda timeout: calls.append("schema"))
+    monkeypatch.setattr(db, "warm_up", lambda timeout: calls.append("pool"))
+    monkeypatch.setattr(db, "get_jobs_page", lambda: None)
+    monkeypatch.setattr(db, "get_job_facets", lambda: None)
+    monkeypatch.setattr(app_module.recommend, "ensure_index", lambda: None)
+    assert app_module.warm_up() is True
+    assert app_module.warm_up() is True
+    assert calls == ["schema", "pool"]
+
+
+def test_schema_check_connect_is_bounded_by_timeout(monkeypatch):
+    attempts = []
+
+    def connect(conninfo, **kwargs):
+        attempts.append(kwargs.get("connect_timeout"))
+        raise OperationalError("connection timeout expired")
+
+    monkeypatch.setattr(db, "conn_str", "postgresql:///joblynk")
+    monkeypatch.setattr(migrations, "connect", connect)
+    assert app_module.warm_up(2) is False
+    assert app_module.warm_up(0.5) is False
+    assert attempts == [2, 1]
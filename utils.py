@@ -1,51 +1,73 @@
 # utils.py
-from flask import make_response, request, redirect, url_for
+from flask import make_response, request, redirect, url_for, current_app, g
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 import db
 
+AUTH_COOKIE = 'auth_token'
+AUTH_MAX_AGE = 3600  # 1 hour
+
+def _auth_serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='joblynk-auth')
+
+def get_auth_session():
+    """Return the verified {'user_id', 'role'} carried by the signed auth cookie, or None"""
+    if 'auth_session' not in g:
+        session = None
+        token = request.cookies.get(AUTH_COOKIE)
+        if token:
+            try:
+                data = _auth_serializer().loads(token, max_age=AUTH_MAX_AGE)
+            except BadSignature:  # also raised for expired tokens
+                data = None
+            if isinstance(data, dict) and data.get('role') in ['freelancer', 'employer']:
+                session = data
+        g.auth_session = session
+    return g.auth_session
+
 def user_is_authenticated():
-    """Check if user has valid authentication cookies"""
-    user_id = request.cookies.get('user_id')
-    role = request.cookies.get('role')
-    return user_id and role in ['freelancer', 'employer']
+    """Check if user has a valid, signed authentication cookie"""
+    return get_auth_session() is not None
 
 def user_has_role(required_role):
     """Check if authenticated user has the required role"""
-    if not user_is_authenticated():
-        return False
-    
-    user_id = request.cookies.get('user_id')
-    cookie_role = request.cookies.get('role')
-    
-    # Verify the role matches what's in the database (security check)
-    user = db.get_user_by_id(int(user_id))
-    if not user or user['role'] != cookie_role:
-        return False
-    
-    return cookie_role == required_role
+    # The role was verified against the database when the token was issued and
+    # the signature stops clients from editing it, so no lookup is needed here.
+    session = get_auth_session()
+    return session is not None and session['role'] == required_role
 
 def get_current_user_role():
-    """Get the current user's role from cookies"""
-    return request.cookies.get('role')
+    """Get the current user's role from the auth cookie"""
+    session = get_auth_session()
+    return session['role'] if session else None
 
 def get_current_user_id():
-    """Get the current user's ID from cookies"""
-    user_id = request.cookies.get('user_id')
-    return int(user_id) if user_id else None
+    """Get the current user's ID from the auth cookie"""
+    session = get_auth_session()
+    return session['user_id'] if session else None
+
+def get_current_user():
+    """Get the current user's record, loading it at most once per request"""
+    if 'current_user' not in g:
+        user_id = get_current_user_id()
+        g.current_user = db.get_user_by_id(user_id) if user_id else None
+    return g.current_user
 
 def set_user_cookie_and_redirect(user_id, role):
-    """Set user cookies and redirect to appropriate dashboard"""
+    """Set the signed auth cookie and redirect to appropriate dashboard"""
     if role == 'freelancer':
         response = make_response(redirect(url_for('routes.freelancers_dashboard')))
     else:
         response = make_response(redirect(url_for('routes.employers_dashboard')))
-    
-    response.set_cookie('user_id', str(user_id), max_age=3600)  # 1 hour
-    response.set_cookie('role', role, max_age=3600)  # 1 hour
+
+    token = _auth_serializer().dumps({'user_id': user_id, 'role': role})
+    response.set_cookie(AUTH_COOKIE, token, max_age=AUTH_MAX_AGE, httponly=True, samesite='Lax')
     return response
 
 def clear_user_cookies():
     """Clear user authentication cookies"""
     response = make_response(redirect(url_for('routes.index')))
+    response.set_cookie(AUTH_COOKIE, '', expires=0)
+    # Cookies used before the signed token was introduced
     response.set_cookie('user_id', '', expires=0)
     response.set_cookie('role', '', expires=0)
-    return response
\ No newline at end of file
+    return response